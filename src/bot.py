@@ -5,7 +5,6 @@ from datetime import datetime
 from functools import partial
 from threading import Event
 from time import sleep
-from copy import deepcopy
 
 from nemo.core.game import Game
 from nemo.core.move import Move
@@ -48,7 +47,7 @@ def think(searcher, position, time: float = THINK_TIME, depth=7, event=None):
     if event.is_set():
         event.clear()
 
-    p = deepcopy(position)
+    p = position.copy()
     tasks = [
         executor.submit(searcher.search, p, depth),
         executor.submit(interrupt, time, event),
@@ -6,17 +6,21 @@ import sys
 from abc import ABC, abstractmethod
 from collections import deque
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, TimeoutError
+from dataclasses import fields
+from json import dumps
 from pprint import pprint
 from threading import Event
 from time import time, sleep
 from typing import Any, Callable, List, Optional, TypeVar, Generic
 
+from nemo.core.bench import BENCH_DEPTH, format_bench, run_bench
 from nemo.core.game import Game
 from nemo.core.move import Move
 from nemo.core.position import Position
-from nemo.core.search import Searcher, probe_ttable
-from nemo.core.transposition import TTable, Killers
-from nemo.core.constants import STARTING_FEN, MAX_PLY
+from nemo.core.search import Searcher, SearchOptions, probe_ttable
+from nemo.core.smp import LazySMPSearcher
+from nemo.core.transposition import TTable, Killers, clear_tables
+from nemo.core.constants import STARTING_FEN, MAX_PLY, TTABLE_SIZE_MB
 from nemo.core.utils import pairwise
 
 logging.basicConfig(filename='nemo.log', level=logging.DEBUG)
@@ -114,7 +118,7 @@ class Engine(AbstractUCIInterface):
 
         self.__executor = executor or ThreadPoolExecutor(max_workers=4)
         self.__stopped = Event()
-        self.__searcher = Searcher(event=self.__stopped)
+        self.__searcher = LazySMPSearcher(event=self.__stopped)
         self.__search_task = None
         self.__tasks = deque([])
         self.__best_move = None
@@ -137,6 +141,13 @@ class Engine(AbstractUCIInterface):
     async def uci(self) -> None:
         output("id name nemo")
         output("id author @rainmayecho")
+        output(f"option name Hash type spin default {TTABLE_SIZE_MB} min 1 max 65536")
+        output("option name Threads type spin default 1 min 1 max 128")
+        for field in fields(SearchOptions):
+            if field.type is bool:
+                output(f"option name {field.name} type check default {str(field.default).lower()}")
+            else:
+                output(f"option name {field.name} type spin default {field.default} min 1 max 10000")
         output("uciok")
 
     async def debug(self, on) -> None:
@@ -146,10 +157,25 @@ class Engine(AbstractUCIInterface):
         output("readyok")
 
     async def setoption(self, options) -> None:
-        pass
+        match = re.match(r"name\s+(?P<name>.+?)\s+value\s+(?P<value>.+)", options.strip())
+        if match is None:
+            return
+        name, value = match.group("name").lower(), match.group("value")
+        self.__options[name] = value
+        if name == "hash":
+            TTable.resize(int(value))
+        elif name == "threads":
+            self.__searcher.workers = int(value)
+        elif hasattr(self.__searcher.options, name):
+            current = getattr(self.__searcher.options, name)
+            if isinstance(current, bool):
+                setattr(self.__searcher.options, name, value.lower() == "true")
+            else:
+                setattr(self.__searcher.options, name, type(current)(value))
 
     async def ucinewgame(self):
         await self.stop()
+        clear_tables()
         self.__position = Position()
 
     async def position(
@@ -184,7 +210,7 @@ class Engine(AbstractUCIInterface):
             self.__ponder = ponder
 
         if depth is not None:
-            self.__depth = depth
+            self.__depth = max(1, min(depth, MAX_PLY))  # the per-ply tables hold MAX_PLY plies
         else:
             self.__depth = 12
 
@@ -207,12 +233,28 @@ class Engine(AbstractUCIInterface):
     async def ponderhit(self):
         pass
 
+    async def bench(self, args: str = "") -> None:
+        """Non-UCI ``bench [depth] [json]``: searches the bench positions, see ``nemo.core.bench``.
+
+        Uses the current search options and leaves the tables cleared, as after ``ucinewgame``.
+        """
+        words = args.split()
+        depth = next((int(word) for word in words if word.isdigit()), BENCH_DEPTH)
+        as_json = "json" in words
+        report = run_bench(depth, options=self.__searcher.options, log=None if as_json else output)
+        if as_json:
+            output(dumps(report))
+        else:
+            for line in format_bench(report):
+                output(line)
+
     async def info(self):
         pv = f"Principal Variation: {' '.join(s for s in self.iter_formatted_principal_variation())}"
         output(pv)
         pprint(self.__searcher.stats)
 
     async def quit(self):
+        self.__searcher.close()
         sys.exit(0)
 
     def iter_formatted_principal_variation(self, uci=True):
@@ -0,0 +1,114 @@
+"""Search benchmark over a fixed set of positions.
+
+Run ``python -m nemo.core.bench`` from ``src``, or send ``bench`` to the UCI engine. Every
+position is searched to the same depth from cleared tables of a fixed size, so the total node
+count is a signature of the search: it changes only when search behaviour does, while the time
+and nodes per second measure speed.
+"""
+from argparse import ArgumentParser
+from json import dumps
+from time import time
+from typing import Callable, List, Sequence
+
+from .constants import STARTING_FEN, TTABLE_SIZE_MB
+from .position import Position
+from .search import Searcher, SearchOptions
+from .transposition import TTable, clear_tables
+
+BENCH_DEPTH = 4
+BENCH_HASH_MB = TTABLE_SIZE_MB
+BENCH_FENS = (
+    STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r2r3k/ppp3pp/8/b5N1/2Q5/8/5PP1/6K1 w - - 0 1",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "2r3k1/pp3ppp/2n1p3/3pP3/3P4/P1R2N2/1P3PPP/6K1 w - - 0 25",
+    "8/8/4k3/3p4/3P4/4K3/8/8 w - - 0 1",
+)
+
+
+def run_bench(
+    depth: int = BENCH_DEPTH,
+    fens: Sequence[str] = BENCH_FENS,
+    options: SearchOptions = None,
+    hash_mb: int = BENCH_HASH_MB,
+    log: Callable[[str], None] = None,
+) -> dict:
+    """Searches every position to ``depth`` and returns the report.
+
+    The transposition table is resized to ``hash_mb`` for the run and put back afterwards;
+    every table the search learns from is cleared before each position.
+    """
+    size_mb = TTable.size_mb
+    if size_mb != hash_mb:
+        TTable.resize(hash_mb)
+    results = []
+    try:
+        for i, fen in enumerate(fens):
+            clear_tables()
+            searcher = Searcher(options=options, verbose=False)
+            start = time()
+            result = searcher.search(Position(fen=fen), depth)
+            seconds = time() - start
+            nodes = searcher.stats["nodes"]
+            results.append(
+                {
+                    "fen": fen,
+                    "move": str(result.move) if result is not None else None,
+                    "score": result.score if result is not None else None,
+                    "nodes": nodes,
+                    "seconds": round(seconds, 3),
+                    "nps": round(nodes / seconds) if seconds else 0,
+                }
+            )
+            if log is not None:
+                log(f"position {i + 1}/{len(fens)} {fen}: {results[-1]['move']} nodes {nodes}")
+    finally:
+        if size_mb != hash_mb:
+            TTable.resize(size_mb)
+        clear_tables()
+
+    nodes = sum(result["nodes"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    return {
+        "depth": depth,
+        "hash_mb": hash_mb,
+        "positions": results,
+        "nodes": nodes,
+        "seconds": round(seconds, 3),
+        "nps": round(nodes / seconds) if seconds else 0,
+    }
+
+
+def format_bench(report: dict) -> List[str]:
+    return [
+        f"Total time (ms) : {round(report['seconds'] * 1000)}",
+        f"Nodes searched  : {report['nodes']}",
+        f"Nodes/second    : {report['nps']}",
+    ]
+
+
+def main(argv: List[str] = None) -> None:
+    parser = ArgumentParser(description="Searches a fixed position set for a node signature and speed.")
+    parser.add_argument("--depth", type=int, default=BENCH_DEPTH)
+    parser.add_argument("--hash", type=int, default=BENCH_HASH_MB, dest="hash_mb", help="table size in MB")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = run_bench(args.depth, hash_mb=args.hash_mb, log=None if args.json else print)
+    if args.json:
+        print(dumps(report, indent=4))
+    else:
+        print("\n".join(format_bench(report)))
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
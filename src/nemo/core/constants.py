@@ -27,3 +27,10 @@ INFINITY = float("inf")
 
 MAX_PLY = 31
 QUIESCENCE_SEARCH_DEPTH_PLY = 5
+UNDO_STACK_SIZE = 256  # preallocated undo records; grows for longer games
+COPY_UNDO_STACK_SIZE = 8  # for ``Position.copy``, which mostly makes a move or two
+
+TTABLE_SIZE_MB = 16
+EVAL_CACHE_SIZE = 1 << 16
+PAWN_HASH_SIZE = 1 << 14
+PERFT_HASH_SIZE_MB = 16  # ``perft(..., hash_mb=...)`` and ``src/perft.py --hash``
@@ -1,21 +1,13 @@
 from typing import Tuple
 
 from .types import Bitboard, Color, PieceType, Square, AbstractPiece, EMPTY
-from .move import Move
+from .move import CAPTURE_FLAG, FROM_SHIFT, SQUARE_MASK
 from .move_gen import ring
+from .psqt import PIECE_VALUES, PIECE_SQUARE_TABLES, PHASE_MATERIAL
 from .stacked_bitboard import StackedBitboard
-from .utils import popcnt, iter_bitscan_forward, flatten, lsb
-
-PIECE_VALUES = {
-    PieceType.NULL: 0,
-    PieceType.ENPASSANT: 0,
-    PieceType.PAWN: 100,
-    PieceType.KNIGHT: 280,
-    PieceType.BISHOP: 330,
-    PieceType.ROOK: 490,
-    PieceType.QUEEN: 900,
-    PieceType.KING: 20000,
-}
+from .transposition import PawnHash
+from .utils import popcnt, popcnt_many, iter_bitscan_forward, lsb, file_mask
+
 COLOR_MULT = {
     Color.WHITE: 1,
     Color.BLACK: -1,
@@ -37,174 +29,36 @@ MATE_LOWER = (
     )
 )
 
-W_PAWNS_TABLE = flatten(
-    [
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [50, 50, 50, 50, 50, 50, 50, 50],
-        [10, 10, 20, 30, 30, 20, 10, 10],
-        [5,  5, 15, 35, 35, 15,  5,  5],
-        [0,  0,  0, 25, 25,  0,  0,  0],
-        [5, -5,-10,  0,  0,-10, -5,  5],
-        [5, 10, 10,-20,-20, 10, 10,  5],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-    ][::-1]
-)
-
-B_PAWNS_TABLE = flatten(
-    [
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [50, 50, 50, 50, 50, 50, 50, 50],
-        [10, 10, 20, 30, 30, 20, 10, 10],
-        [0,  0,  0, 25, 25,  0,  0,  0],
-        [5,  5, 15, 27, 27, 15,  5,  5],
-        [5, -5,-10,  0,  0,-10, -5,  5],
-        [5, 10, 10,-20,-20, 10, 10,  5],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-    ]
-)
-
-KNIGHTS_TABLE = flatten(
-    [
-        [-50, -40, -30, -30, -30, -30, -40, -50],
-        [-40, -20,   0,   0,   0,   0, -20, -40],
-        [-30,   0,  10,  15,  15,  10,   0, -30],
-        [-30,   5,  15,  20,  20,  15,   5, -30],
-        [-30,   0,  15,  20,  20,  15,   0, -30],
-        [-30,   5,  10,  15,  15,  10,   5, -30],
-        [-40, -20,   0,   5,   5,   0, -20, -40],
-        [-50, -40, -30, -30, -30, -30, -40, -50],
-    ]
-)
-
-W_BISHOPS_TABLE = flatten(
-    [
-        [-20,-10,-10,-10,-10,-10,-10,-20],
-        [-10,  0,  0,  0,  0,  0,  0,-10],
-        [-10,  0,  5, 10, 10,  5,  0,-10],
-        [-10,  5,  5, 10, 10,  5,  5,-10],
-        [-10,  0, 10, 10, 10, 10,  0,-10],
-        [-10, 10, 10, 10, 10, 10, 10,-10],
-        [-10,  5,  0,  0,  0,  0,  5,-10],
-        [-20,-10,-10,-10,-10,-10,-10,-20],
-    ][::-1]
-)
-
-B_BISHOPS_TABLE = flatten(
-    [
-        [-20,-10,-10,-10,-10,-10,-10,-20],
-        [-10,  0,  0,  0,  0,  0,  0,-10],
-        [-10,  0,  5, 10, 10,  5,  0,-10],
-        [-10,  5,  5, 10, 10,  5,  5,-10],
-        [-10,  0, 10, 10, 10, 10,  0,-10],
-        [-10, 10, 10, 10, 10, 10, 10,-10],
-        [-10,  5,  0,  0,  0,  0,  5,-10],
-        [-20,-10,-10,-10,-10,-10,-10,-20],
-    ]
-)
-
-W_ROOKS_TABLE = flatten(
-    [
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [15, 20, 20, 20, 20, 20, 20, 15],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  5,  5,  0,  0,  0],
-    ][::-1]
-)
-
-B_ROOKS_TABLE = flatten(
-    [
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [15, 20, 20, 20, 20, 20, 20, 15],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  0,  0,  0,  0,  0],
-        [0,  0,  0,  5,  5,  0,  0,  0],
-    ]
-)
-
-W_QUEENS_TABLE = flatten(
-    [
-        [-20,-10,-10 , -5, -5,-10,-10,-20],
-        [-10 ,  0,  0,  0,  0,  0,  0,-10],
-        [-10 ,  0,  5,  5,  5,  5,  0,-10],
-        [-5 ,  0,  5,  5,  5,  5,  0, -5],
-        [0,  0,  5,  5,  5,  5,  0, -5],
-        [-10 ,  5,  5,  5,  5,  5,  0,-10],
-        [-10 ,  0,  5,  0,  0,  0,  0,-10],
-        [-20,-10,-10 , -5, -5,-10,-10,-20],
-    ][::-1]
-)
-
-B_QUEENS_TABLE = flatten(
-    [
-        [-20,-10,-10 , -5, -5,-10,-10,-20],
-        [-10 ,  0,  0,  0,  0,  0,  0,-10],
-        [-10 ,  0,  5,  5,  5,  5,  0,-10],
-        [-5 ,  0,  5,  5,  5,  5,  0, -5],
-        [0,  0,  5,  5,  5,  5,  0, -5],
-        [-10 ,  5,  5,  5,  5,  5,  0,-10],
-        [-10 ,  0,  5,  0,  0,  0,  0,-10],
-        [-20,-10,-10 , -5, -5,-10,-10,-20],
-    ]
-)
-
-W_KINGS_TABLE = flatten(
-    [
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-20,-30,-30,-40,-40,-30,-30,-20],
-        [-10,-20,-20,-20,-20,-20,-20,-10],
-        [20, 20,  0,  0,  0,  0, 20, 20],
-        [25, 40, 10,  0,  0, 10, 40, 25],
-    ][::-1]
-)
-
-B_KINGS_TABLE = flatten(
-    [
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-30,-40,-40,-50,-50,-40,-40,-30],
-        [-20,-30,-30,-40,-40,-30,-30,-20],
-        [-10,-20,-20,-20,-20,-20,-20,-10],
-        [20, 20,  0,  0,  0,  0, 20, 20],
-        [25, 40, 10,  0,  0, 10, 40, 25],
-    ]
-)
-
-
-PIECE_SQUARE_TABLES = {
-    Color.WHITE: {
-        PieceType.PAWN: W_PAWNS_TABLE,
-        PieceType.KING: W_KINGS_TABLE,
-        PieceType.KNIGHT: KNIGHTS_TABLE,
-        PieceType.ROOK: W_ROOKS_TABLE,
-        PieceType.BISHOP: W_BISHOPS_TABLE,
-        PieceType.QUEEN: W_QUEENS_TABLE,
-    },
-    Color.BLACK: {
-        PieceType.PAWN: B_PAWNS_TABLE,
-        PieceType.KING: B_KINGS_TABLE,
-        PieceType.KNIGHT: KNIGHTS_TABLE,
-        PieceType.ROOK: B_ROOKS_TABLE,
-        PieceType.BISHOP: B_BISHOPS_TABLE,
-        PieceType.QUEEN: B_QUEENS_TABLE,
-    },
-}
 
 W_MAT = 1.0
 W_KS = 1.4
 W_ATT = .2
 W_MOB = .25
 W_PLAC = 1.3
+W_PAWN = 1.0
+
+ISOLATED_PAWN_PENALTY = -12
+DOUBLED_PAWN_PENALTY = -15
+PASSED_PAWN_BONUS = [0, 5, 10, 20, 35, 60, 100, 0]  # by relative rank
+
+FILE_MASKS = [file_mask(f) for f in range(8)]
+ADJACENT_FILE_MASKS = [
+    (FILE_MASKS[f - 1] if f > 0 else 0) | (FILE_MASKS[f + 1] if f < 7 else 0) for f in range(8)
+]
+# Squares in front of a pawn on its own and adjacent files, by color and square.
+PASSED_PAWN_MASKS = {
+    Color.WHITE: [
+        (FILE_MASKS[s & 7] | ADJACENT_FILE_MASKS[s & 7]) & ~((1 << ((s | 7) + 1)) - 1)
+        for s in range(64)
+    ],
+    Color.BLACK: [
+        (FILE_MASKS[s & 7] | ADJACENT_FILE_MASKS[s & 7]) & ((1 << (s & 56)) - 1)
+        for s in range(64)
+    ],
+}
+
+# Checks the incremental material and piece-square scores on every evaluation.
+DEBUG_INCREMENTAL_SCORES = False
 
 
 def least_valuable_attacker(c: Color, bitboards: StackedBitboard, attack_defend_bb: Bitboard) -> Tuple[Bitboard, AbstractPiece]:
@@ -220,12 +74,12 @@ def least_valuable_attacker(c: Color, bitboards: StackedBitboard, attack_defend_
     return (EMPTY, PieceType.NULL)
 
 
-def see(node: "Position", move: Move = None) -> float:
+def see(node: "Position", move: int = None) -> float:
     """Static-Exchange-Evaluation
 
     Args:
         node: The current position to see
-        move (Move, optional): The capture move to play. Defaults to None.
+        move (int, optional): The encoded capture move to play. Defaults to None.
 
     Returns:
         float: The score associated with this capture. Positive is good.
@@ -234,21 +88,22 @@ def see(node: "Position", move: Move = None) -> float:
     bitboards = node.boards
     if move is None:
         return 0
-    if not move.is_capture:
+    if not move & CAPTURE_FLAG:
         return 0
+    _from, _to = (move >> FROM_SHIFT) & SQUARE_MASK, move & SQUARE_MASK
     i = 0
     gain = [0] * 32
-    target = bitboards.piece_at(move._to)
+    target = bitboards.piece_at(_to)
     if target is None:
         return 0
     occ = bitboards.occupancy
-    from_bb = Bitboard(1 << move._from)
-    attack_defend_bb = bitboards.attack_defend_to(move._to, c)
+    from_bb = 1 << _from
+    attack_defend_bb = bitboards.attack_defend_to(_to, c)
     xrays = bitboards.xrays_bb
     gain[i] = PIECE_VALUES[target._type]
     assert target is not None
 
-    pt = (bitboards.piece_at(move._from))._type
+    pt = (bitboards.piece_at(_from))._type
     while True:
         i += 1
         gain[i] = PIECE_VALUES[pt] - gain[i-1]
@@ -270,12 +125,7 @@ def see(node: "Position", move: Move = None) -> float:
 
 def material_difference(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
     """Returns the material difference from the perspective of ``c``."""
-    score = 0
-    for piece_type, self_piece_bb, other_piece_bb in bitboards.iter_material(c):
-        score += (PIECE_VALUES[piece_type] * popcnt(self_piece_bb)) - (PIECE_VALUES[
-            piece_type
-        ] * popcnt(other_piece_bb))
-    return score
+    return bitboards.material(c) - bitboards.material(~c)
 
 
 def attacks(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
@@ -290,24 +140,21 @@ def attacks(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
 
 
 def mobility(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
-    mob = 0
-    self_bb = bitboards.by_color(c)
-    other_bb = bitboards.by_color(~c)
+    attack_bbs = []
     for piece_type, self_attack_bb, other_attack_bb in bitboards.iter_attacks(c):
-        mob += popcnt(self_attack_bb) - popcnt(other_attack_bb)
-    return mob
+        attack_bbs += (self_attack_bb, other_attack_bb)
+    counts = popcnt_many(attack_bbs)  # ours at even indices, theirs at odd ones
+    return sum(counts[::2]) - sum(counts[1::2])
 
 
 def placement(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
-    placement = 0
-    self_bb = bitboards.by_color(c)
-    other_bb = bitboards.by_color(~c)
-    for piece_type, self_piece_bb, other_piece_bb in bitboards.iter_material(c):
-        for s in iter_bitscan_forward(self_piece_bb):
-            placement += PIECE_SQUARE_TABLES[c][piece_type][s]
-        for s in iter_bitscan_forward(other_piece_bb):
-            placement -= PIECE_SQUARE_TABLES[~c][piece_type][s]
-    return placement
+    """Piece-square score from the perspective of ``c``, tapered from the midgame to the
+    endgame tables as material comes off the board."""
+    phase = bitboards.phase
+    self_mg, self_eg = bitboards.psq(c)
+    other_mg, other_eg = bitboards.psq(~c)
+    mg, eg = self_mg - other_mg, self_eg - other_eg
+    return (mg * phase + eg * (PHASE_MATERIAL - phase)) / PHASE_MATERIAL
 
 
 def king_safety(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
@@ -323,16 +170,50 @@ def king_safety(c: Color, bitboards: StackedBitboard, **kwargs) -> float:
     return v * 10
 
 
+def pawn_terms(bitboards: StackedBitboard) -> Tuple[int, int, int]:
+    """Passed pawn bonus and counts of isolated and doubled pawns, from white's perspective."""
+    passed = isolated = doubled = 0
+    boards = bitboards.boards
+    for c in Color:
+        k = COLOR_MULT[c]
+        own, other = boards[c * 8 + PieceType.PAWN], boards[(~c) * 8 + PieceType.PAWN]
+        for s in iter_bitscan_forward(own):
+            if not own & ADJACENT_FILE_MASKS[s & 7]:
+                isolated += k
+            if not other & PASSED_PAWN_MASKS[c][s]:
+                passed += k * PASSED_PAWN_BONUS[(s >> 3) if c == Color.WHITE else 7 - (s >> 3)]
+        for f in range(8):
+            n = popcnt(own & FILE_MASKS[f])
+            if n > 1:
+                doubled += k * (n - 1)
+    return passed, isolated, doubled
+
+
+def pawn_structure(c: Color, bitboards: StackedBitboard, pawn_key: int = None, **kwargs) -> float:
+    """Pawn-structure score from the perspective of ``c``, cached in ``PawnHash`` by pawn key."""
+    terms = PawnHash.get(pawn_key) if pawn_key is not None else None
+    if terms is None:
+        terms = pawn_terms(bitboards)
+        if pawn_key is not None:
+            PawnHash[pawn_key] = terms
+    passed, isolated, doubled = terms
+    v = passed + ISOLATED_PAWN_PENALTY * isolated + DOUBLED_PAWN_PENALTY * doubled
+    return v * COLOR_MULT[c]
+
+
 HEURISTICS = [
     (material_difference, W_MAT),
     (attacks, W_ATT),
     (mobility, W_MOB),
     (placement, W_PLAC),
     (king_safety, W_KS),
+    (pawn_structure, W_PAWN),
 ]
 
 
 def evaluate(position: "Position", as_opponent=False) -> float:
+    if DEBUG_INCREMENTAL_SCORES:
+        position.boards.check_scores()
     c = position.state.turn
     k = COLOR_MULT[c]
     bonus = 0
@@ -341,8 +222,8 @@ def evaluate(position: "Position", as_opponent=False) -> float:
     elif position.is_stalemate():
         return 0
     bonus += 142 * k * position.other_in_check()
-    bonus += 397 * k * (position.other_in_double_check() or len(list(position.legal_moves)) <= 2)
-    v = sum(H(c, position.boards) * w for H, w in HEURISTICS)
+    bonus += 397 * k * (position.other_in_double_check() or len(position.legal_moves) <= 2)
+    v = sum(H(c, position.boards, pawn_key=position.pawn_key) * w for H, w in HEURISTICS)
     return v + bonus
 
 
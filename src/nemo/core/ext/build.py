@@ -1,31 +1,58 @@
-import os
+"""cffi build of the C bit helpers in ``utils.c``, with a pure-Python fallback in ``utils``.
 
-from cffi import FFI
+Run ``python -m nemo.core.ext.build`` from ``src`` to compile ``_pyutils`` next to this file;
+it needs cffi and a C compiler. Without the compiled module, or with ``NEMO_PURE_PYTHON`` set
+in the environment, ``build_library`` reports no extension and ``utils`` uses Python.
+"""
+import os
 from typing import Tuple
 
 DIR_PATH = os.path.dirname(os.path.realpath(__file__))
-EXT_EXISTS = False
-lib = None
+SRC_PATH = os.path.dirname(os.path.dirname(os.path.dirname(DIR_PATH)))  # holds ``nemo``
+MODULE_NAME = "nemo.core.ext._pyutils"
+PURE_PYTHON_ENV = "NEMO_PURE_PYTHON"
+
+CDEF = """
+uint64_t lsb(uint64_t v);
+uint64_t bb(uint64_t v);
+unsigned int popcnt(uint64_t x);
+int bitScanForward(uint64_t bb);
+int bitscan_all(uint64_t bb, unsigned char *squares);
+void popcnt_many(const uint64_t *boards, size_t n, unsigned char *counts);
+"""
+
+
+def ffibuilder() -> "FFI":
+    from cffi import FFI
 
-def __build():
+    ffi = FFI()
+    ffi.cdef(CDEF)
+    ffi.set_source(
+        MODULE_NAME,
+        '#include "utils.h"',
+        # relative to SRC_PATH, where cffi builds, so the objects land next to the sources
+        sources=[os.path.relpath(os.path.join(DIR_PATH, "utils.c"), SRC_PATH)],
+        include_dirs=[DIR_PATH],
+        extra_compile_args=["-O3"],
+    )
+    return ffi
+
+
+def compile_library(verbose: bool = False) -> str:
+    """Compiles the extension in place and returns the path of the built module."""
+    return ffibuilder().compile(tmpdir=SRC_PATH, verbose=verbose)
+
+
+def build_library() -> Tuple[bool, "FFI", "CLib"]:
+    """Loads the compiled helpers, or returns ``(False, None, None)`` to fall back to Python."""
+    if os.environ.get(PURE_PYTHON_ENV):
+        return False, None, None
     try:
-        from cffi import FFI
-        ffi = FFI()
-        ffi.cdef("unsigned long long lsb(unsigned long long v);")
-        ffi.cdef("unsigned long long bb(unsigned long long v);")
-        ffi.cdef("unsigned long popcnt(unsigned long);")
-        ffi.cdef("int bitScanForward(unsigned long long bb);")
-        # ffi.set_source("pyutils",'#include "utils.h"', sources=["utils.c"])
-        # print(ffi.compile())
-        lib = ffi.dlopen(f"{DIR_PATH}/pyutils.pypy37-pp73-darwin.so")
-        EXT_EXISTS = lib is not None
-        return EXT_EXISTS, lib
-    except Exception as e:
-        print(e)
-
-
-def build_library() -> Tuple[bool, "CLib"]:
-    return __build()
+        from ._pyutils import ffi, lib
+    except ImportError:
+        return False, None, None
+    return True, ffi, lib
+
 
 if __name__ == "__main__":
-    build_library()
\ No newline at end of file
+    print(compile_library(verbose=True))
@@ -1,19 +1,23 @@
 #include "utils.h"
 
-unsigned long long lsb(unsigned long long v) {
+uint64_t lsb(uint64_t v) {
     return v & -v;
 }
 
-unsigned long long bb(unsigned long long v) {
-    return (unsigned long long) v;
+uint64_t bb(uint64_t v) {
+    return v;
 }
 
-unsigned long popcnt(unsigned long x)
+unsigned int popcnt(uint64_t x)
 {
-    unsigned long c = 0;
+#if defined(__GNUC__)
+    return __builtin_popcountll(x);
+#else
+    unsigned int c = 0;
     for (; x != 0; x &= x - 1)
         c++;
     return c;
+#endif
 }
 
 const int index64[64] = {
@@ -27,7 +31,25 @@ const int index64[64] = {
    25, 14, 19,  9, 13,  8,  7,  6
 };
 
-int bitScanForward(unsigned long long bb) {
-   const unsigned long debruijn64 = 0x03f79d71b4cb0a89;
+int bitScanForward(uint64_t bb) {
+#if defined(__GNUC__)
+   return bb ? __builtin_ctzll(bb) : 0;
+#else
+   const uint64_t debruijn64 = 0x03f79d71b4cb0a89ULL;
    return index64[((bb & -bb) * debruijn64) >> 58];
-}
\ No newline at end of file
+#endif
+}
+
+/* Writes the index of every set bit of bb to squares, lowest first; returns how many. */
+int bitscan_all(uint64_t bb, unsigned char *squares) {
+    int n = 0;
+    for (; bb; bb &= bb - 1)
+        squares[n++] = (unsigned char) bitScanForward(bb);
+    return n;
+}
+
+/* Writes the popcount of each of the n boards to counts. */
+void popcnt_many(const uint64_t *boards, size_t n, unsigned char *counts) {
+    for (size_t i = 0; i < n; i++)
+        counts[i] = (unsigned char) popcnt(boards[i]);
+}
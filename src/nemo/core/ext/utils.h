@@ -1,10 +1,14 @@
+#include <stddef.h>
+#include <stdint.h>
 
-typedef unsigned long u64;
+uint64_t lsb(uint64_t v);
 
-unsigned long long lsb(unsigned long long v);
+uint64_t bb(uint64_t v);
 
-unsigned long long bb(unsigned long long v);
+unsigned int popcnt(uint64_t x);
 
-unsigned long popcnt(unsigned long x);
+int bitScanForward(uint64_t bb);
 
-int bitScanForward(unsigned long long bb);
\ No newline at end of file
+int bitscan_all(uint64_t bb, unsigned char *squares);
+
+void popcnt_many(const uint64_t *boards, size_t n, unsigned char *counts);
@@ -0,0 +1,454 @@
+"""Builds ``magic.bin``, the sliding attack tables that ``magic`` maps at import.
+
+Run ``python -m nemo.core.magic_gen --help`` from ``src``. Squares are searched in a process
+pool, each from its own generator seeded from ``--seed``, and magics from the existing table
+are tried first, so a rebuild only searches squares whose table size changed.
+"""
+import os
+import sys
+from argparse import ArgumentParser
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from hashlib import sha256
+from json import dumps
+from mmap import mmap, ACCESS_READ
+from operator import ior
+from random import Random
+from struct import Struct, error as StructError
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from .utils import (
+    popcnt,
+    rank_mask,
+    file_mask,
+    diag_mask,
+    antidiag_mask,
+    BIT_TABLE,
+)
+from .constants import MAX_INT
+from .types import Bitboard, Square, Ranks, Files, Squares, EMPTY
+
+NOT_EDGES = MAX_INT ^ (Ranks.RANK_8 | Ranks.RANK_1 | Files.A | Files.H)
+
+# After the header come little-endian uint64s: the 64 rook magics, the 64 bishop magics, the
+# 64 rook shifts, the 64 bishop shifts, every square's rook attacks and every square's bishop
+# attacks, ``1 << (64 - shift)`` each, then the ``LINE`` and ``BETWEEN`` tables.
+MAGIC_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "magic.bin")
+MAGIC_TABLE_TAG = b"NEMOMAGC"
+MAGIC_TABLE_VERSION = 3
+MAGIC_TABLE_HEADER = Struct("<8sII32s")  # tag, version, seed, sha256 of the rest
+MAGIC_SEED = 0x6E656D6F
+ATTACKS_OFFSET = 256
+
+# "fancy" packs every square's table at its own size; "fixed" gives every square of a piece
+# the largest size, so all of them share one shift.
+LAYOUTS = ("fancy", "fixed")
+
+
+def rook_mask(s: Square) -> Bitboard:
+    """Generates the relevant blocker mask for a rook on square s."""
+    r, f = divmod(s, 8)
+    mask = EMPTY
+    for _r in range(1, 7):
+        mask |= (1 << (_r * 8 + f)) if _r != r else 0
+    for _f in range(1, 7):
+        mask |= (1 << (r * 8 + _f)) if _f != f else 0
+    return mask
+
+
+def bishop_mask(s: Square) -> Bitboard:
+    """Generates the relevant blocker mask for a bishop on square s."""
+    mask = (diag_mask(s) | antidiag_mask(s)) ^ (1 << s)
+    return mask & NOT_EDGES
+
+
+def rook_attacks(s: int, blockers: Bitboard) -> Bitboard:
+    attacks = EMPTY
+    r, f = divmod(s, 8)
+
+    for _r in range(r + 1, 8):
+        sb = 1 << (_r * 8 + f)
+        attacks |= sb
+        if blockers & sb:
+            break
+
+    for _r in range(r - 1, -1, -1):
+        sb = 1 << (_r * 8 + f)
+        attacks |= sb
+        if blockers & sb:
+            break
+
+    for _f in range(f + 1, 8):
+        sb = 1 << (r * 8 + _f)
+        attacks |= sb
+        if blockers & sb:
+            break
+
+    for _f in range(f - 1, -1, -1):
+        sb = 1 << (r * 8 + _f)
+        attacks |= sb
+        if blockers & sb:
+            break
+
+    return attacks
+
+
+def bishop_attacks(s: int, blockers: Bitboard) -> Bitboard:
+    attacks = EMPTY
+    r, f = divmod(s, 8)
+
+    _r, _f = r + 1, f + 1
+    while _r < 8 and _f < 8:
+        sb = 1 << (_r * 8 + _f)
+        attacks |= sb
+        if blockers & sb:
+            break
+        _r += 1
+        _f += 1
+
+    _r, _f = r + 1, f - 1
+    while _r < 8 and _f >= 0:
+        sb = 1 << (_r * 8 + _f)
+        attacks |= sb
+        if blockers & sb:
+            break
+        _r += 1
+        _f -= 1
+
+    _r, _f = r - 1, f + 1
+    while _r >= 0 and _f < 8:
+        sb = 1 << (_r * 8 + _f)
+        attacks |= sb
+        if blockers & sb:
+            break
+        _r -= 1
+        _f += 1
+
+    _r, _f = r - 1, f - 1
+    while _r >= 0 and _f >= 0:
+        sb = 1 << (_r * 8 + _f)
+        attacks |= sb
+        if blockers & sb:
+            break
+        _r -= 1
+        _f -= 1
+
+    return attacks
+
+
+# Rook blocker occupancy bitmasks
+ROOK_MASK = [rook_mask(s) for s in range(64)]
+BISHOP_MASK = [bishop_mask(s) for s in range(64)]
+
+# Lookup of number of blocker bits by square index
+ROOK_BITS = [popcnt(m) for m in ROOK_MASK]
+BISHOP_BITS = [popcnt(m) for m in BISHOP_MASK]
+
+
+def bishop_mapping(s: int) -> Dict[int, List[int]]:
+    d = {}
+    n = BISHOP_BITS[s]
+    mask = BISHOP_MASK[s]
+    for i in range(1 << n):
+        b = index_to_bitboard(i, n, mask)
+        d[b] = bishop_attacks(s, b)
+    return d
+
+
+def rook_mapping(s: int) -> Dict[int, List[int]]:
+    d = {}
+    n = ROOK_BITS[s]
+    mask = ROOK_MASK[s]
+    for i in range(1 << n):
+        b = index_to_bitboard(i, n, mask)
+        d[b] = rook_attacks(s, b)
+    return d
+
+
+def _pop_lsb(v: int) -> Tuple[int, int]:
+    b = v ^ (v - 1)
+    fold = (b & 0xFFFFFFFF) ^ (b >> 32)
+    v &= v - 1
+    return v, BIT_TABLE[((fold * 0x783A9B23) & 0xFFFFFFFF) >> 26]
+
+
+def index_to_bitboard(idx: int, bits: int, mask: Bitboard) -> Bitboard:
+    result = EMPTY
+    v = int(mask)
+    for i in range(bits):
+        v, j = _pop_lsb(v)
+        if idx & (1 << i):
+            result |= 1 << j
+    return result
+
+
+def random_magic(rng: Random):
+    def _rand():
+        return reduce(ior, ((rng.getrandbits(64) & 0xFFFF) << (i * 16) for i in range(4)))
+
+    return _rand() & _rand() & _rand()
+
+
+def transform(b: int, magic: int, bits: int) -> int:
+    return (b * magic & MAX_INT) >> (64 - bits)
+
+
+def layout_bits(layout: str) -> Tuple[List[int], List[int]]:
+    """Index bits by square for rooks and bishops in ``layout``."""
+    assert layout in LAYOUTS, f"unknown layout {layout}"
+    if layout == "fixed":
+        return [max(ROOK_BITS)] * 64, [max(BISHOP_BITS)] * 64
+    return list(ROOK_BITS), list(BISHOP_BITS)
+
+
+def table_offsets(
+    rook_shifts: List[int], bishop_shifts: List[int]
+) -> Tuple[List[int], List[int], int]:
+    """Where each square's rook and bishop attacks start in the table, and where ``LINE`` does."""
+    offsets, offset = [], ATTACKS_OFFSET
+    for shift in rook_shifts + bishop_shifts:
+        offsets.append(offset)
+        offset += 1 << (64 - shift)
+    return offsets[:64], offsets[64:], offset
+
+
+def generate_magic(
+    s: int, bits: int, bishop: bool, seed: int = MAGIC_SEED, known: Optional[int] = None
+) -> Tuple[int, List[int], int]:
+    """Generate magic bitboards for fast lookups on sliding piece attacks.
+
+    Taken from: https://www.chessprogramming.org/Looking_for_Magics
+
+    We are precomputing the attack set considering
+    all variations of blockers (max 4096 == 2**12, rook on a1)
+
+    Every square draws from its own generator seeded from ``seed``, so a table is the same
+    whatever order the squares are searched in. A ``known`` magic is tried before any
+    random one. Returns the magic, its attack table and the number of candidates tried.
+    """
+    rng = Random(seed * 128 + bishop * 64 + s)
+    a, b = [0] * 4096, [0] * 4096
+    mask = bishop_mask(s) if bishop else rook_mask(s)
+    n = popcnt(mask)
+    for i in range(1 << n):
+        b[i] = index_to_bitboard(i, n, mask)
+        a[i] = bishop_attacks(s, b[i]) if bishop else rook_attacks(s, b[i])
+
+    for k in range(10000000):
+        magic = known if k == 0 and known else random_magic(rng)
+        if popcnt((magic * mask) & 0xFF00000000000000) < 6:
+            continue
+        i, failed = 0, 0
+        upperbound = 1 << n
+        used = [0] * (1 << bits)
+        while i < upperbound:
+            j = transform(b[i], magic, bits)
+            if not used[j]:
+                used[j] = a[i]
+            elif used[j] != a[i]:
+                failed = 1
+                break
+            i += 1
+        if not failed:
+            return magic, used, k + 1
+
+
+def regenerate_magic(
+    path: str = MAGIC_TABLE_PATH,
+    seed: int = MAGIC_SEED,
+    layout: str = "fancy",
+    workers: int = None,
+    reuse: bool = True,
+) -> Dict:
+    """Searches for the magics, writes the table file to ``path`` and verifies it.
+
+    With ``reuse``, the magics already in ``path`` are tried first. Returns the report.
+    """
+    start = time()
+    rook_bits, bishop_bits = layout_bits(layout)
+    known = read_magics(path) if reuse else None
+    rook_known, bishop_known = known or ([None] * 64, [None] * 64)
+    tasks = [(s, rook_bits[s], 0, seed, rook_known[s]) for s in range(64)] + [
+        (s, bishop_bits[s], 1, seed, bishop_known[s]) for s in range(64)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers < 2:
+        results = [generate_magic(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(generate_magic, *zip(*tasks)))
+
+    magics = [magic for magic, _, _ in results]
+    attacks = [bb for _, table, _ in results for bb in table]
+    shifts = [64 - bits for bits in rook_bits + bishop_bits]
+    digest = write_magic(path, seed, magics + shifts + attacks)
+    squares = [
+        {
+            "piece": "bishop" if bishop else "rook",
+            "square": Squares(s).name,
+            "bits": bits,
+            "magic": hex(magic),
+            "tries": tries,
+            "reused": k is not None and tries == 1 and magic == k,
+        }
+        for (s, bits, bishop, _, k), (magic, _, tries) in zip(tasks, results)
+    ]
+    return {
+        "path": path,
+        "layout": layout,
+        "seed": seed,
+        "workers": workers,
+        "entries": len(attacks),
+        "bytes": os.path.getsize(path),
+        "sha256": digest,
+        "verified": verify_magic(path),
+        "seconds": round(time() - start, 2),
+        "squares": squares,
+    }
+
+
+def write_magic(path: str, seed: int, values: List[int]) -> str:
+    """Writes the magics, shifts and attacks in ``values`` to ``path``, followed by the line
+    tables. Returns the hex digest of the payload."""
+    assert 0 <= seed <= 0xFFFFFFFF, "the seed is stored as a uint32"
+    payload = array("Q", values + line_table() + between_table())
+    if sys.byteorder != "little":
+        payload.byteswap()
+    payload = payload.tobytes()
+    digest = sha256(payload)
+    header = MAGIC_TABLE_HEADER.pack(MAGIC_TABLE_TAG, MAGIC_TABLE_VERSION, seed, digest.digest())
+    with open(path, "wb") as fp:
+        fp.write(header)
+        fp.write(payload)
+    return digest.hexdigest()
+
+
+def load_magic(path: str = MAGIC_TABLE_PATH):
+    """Maps the attack table file read-only and returns it as one flat sequence of uint64s.
+
+    The checksum is verified once here; lookups then read straight from the page cache.
+    """
+    with open(path, "rb") as fp:
+        table = mmap(fp.fileno(), 0, access=ACCESS_READ)
+    tag, version, seed, digest = MAGIC_TABLE_HEADER.unpack_from(table)
+    assert tag == MAGIC_TABLE_TAG and version == MAGIC_TABLE_VERSION, (
+        f"{path} is not a version {MAGIC_TABLE_VERSION} magic table, "
+        "rebuild it with `python -m nemo.core.magic_gen`"
+    )
+    payload = memoryview(table)[MAGIC_TABLE_HEADER.size:]
+    assert sha256(payload).digest() == digest, (
+        f"{path} is corrupt, rebuild it with `python -m nemo.core.magic_gen`"
+    )
+    if sys.byteorder != "little":
+        values = array("Q", payload)
+        values.byteswap()
+        return values
+    return payload.cast("Q")
+
+
+def read_magics(path: str = MAGIC_TABLE_PATH) -> Optional[Tuple[List[int], List[int]]]:
+    """The rook and bishop magics of a valid table file at ``path``, or None."""
+    try:
+        table = load_magic(path)
+    except (OSError, AssertionError, StructError):
+        return None
+    return table[:64].tolist(), table[64:128].tolist()
+
+
+def verify_magic(path: str = MAGIC_TABLE_PATH) -> int:
+    """Checks every entry of the table file against the slow attack generators.
+
+    Returns the number of blocker sets checked.
+    """
+    table = load_magic(path)
+    rook_shifts, bishop_shifts = table[128:192].tolist(), table[192:256].tolist()
+    rook_offsets, bishop_offsets, line_offset = table_offsets(rook_shifts, bishop_shifts)
+    checked = 0
+    for bishop, masks, shifts, offsets, attacks in (
+        (0, ROOK_MASK, rook_shifts, rook_offsets, rook_attacks),
+        (1, BISHOP_MASK, bishop_shifts, bishop_offsets, bishop_attacks),
+    ):
+        for s in range(64):
+            magic, mask = table[bishop * 64 + s], masks[s]
+            n = popcnt(mask)
+            for i in range(1 << n):
+                b = index_to_bitboard(i, n, mask)
+                entry = table[offsets[s] + ((b * magic & MAX_INT) >> shifts[s])]
+                assert entry == attacks(s, b), (
+                    f"bad {'bishop' if bishop else 'rook'} entry on {Squares(s).name}"
+                )
+                checked += 1
+    assert table[line_offset:line_offset + 4096].tolist() == line_table(), "bad LINE table"
+    assert table[line_offset + 4096:].tolist() == between_table(), "bad BETWEEN table"
+    return checked
+
+
+def line_table() -> List[Bitboard]:
+    """The whole line through two squares at ``s1 * 64 + s2``, or EMPTY if they're not aligned."""
+    table = [EMPTY] * 4096
+    for i in range(64):
+        for j in range(i + 1, 64):
+            __rank = rank_mask(i) & rank_mask(j)
+            __file = file_mask(i) & file_mask(j)
+            __diag = diag_mask(i) & diag_mask(j)
+            __antidiag = antidiag_mask(i) & antidiag_mask(j)
+            table[i * 64 + j] = table[j * 64 + i] = __rank | __file | __diag | __antidiag
+    return table
+
+
+def between_table() -> List[Bitboard]:
+    """The squares strictly between two aligned squares at ``s1 * 64 + s2``, else EMPTY."""
+    table = [EMPTY] * 4096
+    for i in range(64):
+        for j in range(i + 1, 64):
+            __mask = EMPTY
+            if j // 8 == i // 8:  # +1 dir
+                d = 1
+            elif diag_mask(i) & diag_mask(j):  # +9 dir
+                d = 9
+            elif antidiag_mask(i) & antidiag_mask(j):  # +7 dir
+                d = 7
+            elif i % 8 == j % 8:  # +8 dir
+                d = 8
+            else:
+                continue
+
+            k = i + d
+            while k < j:
+                __mask |= 1 << k
+                k += d
+            table[i * 64 + j] = table[j * 64 + i] = __mask
+    return table
+
+
+def main(argv: List[str] = None) -> None:
+    parser = ArgumentParser(description="Builds the magic attack table file.")
+    parser.add_argument("--output", default=MAGIC_TABLE_PATH)
+    parser.add_argument("--seed", type=int, default=MAGIC_SEED)
+    parser.add_argument("--layout", choices=LAYOUTS, default="fancy")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--fresh", action="store_true", help="don't try the existing magics first")
+    parser.add_argument("--report", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = regenerate_magic(args.output, args.seed, args.layout, args.workers, not args.fresh)
+    for square in report["squares"]:
+        print(
+            f"{square['piece']:6} {square['square']:2} bits={square['bits']:2} "
+            f"magic={square['magic']} tries={square['tries']}"
+            + (" (reused)" if square["reused"] else "")
+        )
+    print(
+        f"wrote {report['path']}: {report['layout']} layout, seed {report['seed']}, "
+        f"{report['entries']} attack entries, {report['bytes']} bytes, sha256 {report['sha256']}"
+    )
+    print(f"verified {report['verified']} blocker sets in {report['seconds']}s")
+    if args.report:
+        with open(args.report, "w") as fp:
+            fp.write(dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
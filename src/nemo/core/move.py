@@ -1,4 +1,8 @@
+from array import array
 from enum import IntEnum
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
 from .types import Square, SQUARES, Squares, CastlingRights, PieceType, INV_PIECE_TYPE_MAP
 
 
@@ -22,20 +26,41 @@ class MoveFlags(IntEnum):
     PROMOTION_Q_CAPTURE = 15
 
 
-class Move:
-    def __init__(self, _from: int = 0, _to: int = 0, flags: int = 0, uci: str = None, _move : int = None):
-        if _move is not None:
-            self._move = _move
-            self._flags = _move >> 12
-        else:
+# Moves are 16-bit ints, ``flags << 12 | _from << 6 | _to``, in move generation and search.
+FROM_SHIFT = 6
+FLAGS_SHIFT = 12
+SQUARE_MASK = 63
+CAPTURE_FLAG = MoveFlags.CAPTURES << FLAGS_SHIFT
+PROMOTION_FLAG = MoveFlags.PROMOTION << FLAGS_SHIFT
+PROMOTION_PIECE_TYPES = (PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK, PieceType.QUEEN)
+
+MoveArray = array  # array("H") of encoded moves
+
+
+def encode(_from: int, _to: int, flags: int = 0) -> int:
+    return (flags << FLAGS_SHIFT) | (_from << FROM_SHIFT) | _to
+
+
+class Move(int):
+    """An encoded move with a readable interface, for UCI, SAN and PGN.
+
+    Every encoding has one interned instance in ``MOVES``, so constructing a ``Move`` never
+    allocates and a ``Move`` can be passed wherever an encoded int is expected.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, _from: int = 0, _to: int = 0, flags: int = 0, uci: str = None, _move: int = None):
+        if _move is None:
             if uci is not None:
                 _from = Squares[uci[0:2].upper()]._value_
                 _to = Squares[uci[2:4].upper()]._value_
-            else:
-                _from = SQUARES[_from]._value_
-                _to = SQUARES[_to]._value_
-            self._flags = flags
-            self._move = (flags << 12) | ((_from & 63) << 6) | (_to & 63)
+            _move = encode(_from & SQUARE_MASK, _to & SQUARE_MASK, flags)
+        return MOVES[_move]
+
+    @property
+    def _move(self) -> int:
+        return int(self)
 
     @property
     def castling_rights_premask(self) -> int:
@@ -73,24 +98,17 @@ class Move:
 
     @property
     def is_capture(self):
-        return self.flags & MoveFlags.CAPTURES
+        return self & CAPTURE_FLAG
 
     @property
     def is_promotion(self):
-        return self.flags & MoveFlags.PROMOTION
+        return self & PROMOTION_FLAG
 
     @property
     def promotion_piece_type(self):
         if not self.is_promotion:
             return None
-        if self._flags in (MoveFlags.PROMOTION, MoveFlags.PROMOTION_N_CAPTURE):
-            return PieceType.KNIGHT
-        elif self._flags in (MoveFlags.PROMOTION_Q, MoveFlags.PROMOTION_Q_CAPTURE):
-            return PieceType.QUEEN
-        elif self._flags in (MoveFlags.PROMOTION_R, MoveFlags.PROMOTION_R_CAPTURE):
-            return PieceType.ROOK
-        elif self._flags in (MoveFlags.PROMOTION_B, MoveFlags.PROMOTION_B_CAPTURE):
-            return PieceType.BISHOP
+        return PROMOTION_PIECE_TYPES[self.flags & 3]
 
     @property
     def promotion_suffix(self):
@@ -98,15 +116,15 @@ class Move:
 
     @property
     def _to(self):
-        return self._move & 63
+        return self & SQUARE_MASK
 
     @property
     def _from(self):
-        return (self._move >> 6) & 63
+        return (self >> FROM_SHIFT) & SQUARE_MASK
 
     @property
     def flags(self):
-        return self._flags
+        return self >> FLAGS_SHIFT
 
     @property
     def uci(self) -> str:
@@ -123,7 +141,7 @@ class Move:
         yield Square(self._to)
 
     def __invert__(self) -> "Move":
-        return self.__class__(self._to, self._from, self.flags)
+        return MOVES[encode(self._to, self._from, self.flags)]
 
     def __repr__(self) -> str:
         return f"<Move {SQUARES[self._from].name.lower()} to {SQUARES[self._to].name.lower()} flags={self.flags}>"
@@ -131,23 +149,69 @@ class Move:
     def __str__(self) -> str:
         return f"{SQUARES[self._from].name.lower()}{SQUARES[self._to].name.lower()}{self.promotion_suffix}"
 
-    def __hash__(self) -> int:
-        return hash(self._move)
+
+MOVES = [int.__new__(Move, m) for m in range(1 << 16)]
+
 
 class MoveList:
-    """Encapsulates ordering a sequence of candidate moves"""
+    """A reusable buffer of encoded moves with a parallel array of ordering scores.
 
-    def __init__(self, moves):
-        self.__moves = moves
+    The search keeps one per ply and clears it rather than allocating a new list per node.
+    Piece generators append straight into ``moves``, and ``pick`` does one step of a
+    selection sort, so a cutoff leaves the rest of the list unsorted.
+    """
 
-    def __add__(self, *moves):
-        self.__moves = [*self.__moves, *moves]
+    __slots__ = ("moves", "scores")
 
-    def __iter__(self):
-        return self
+    def __init__(self, moves: Iterable[int] = ()):
+        self.moves = array("H", moves)
+        self.scores = array("q")
+
+    def clear(self) -> None:
+        del self.moves[:]
+        del self.scores[:]
+
+    def append(self, move: int) -> None:
+        self.moves.append(move)
+
+    def extend(self, moves: Iterable[int]) -> None:
+        self.moves.extend(moves)
+
+    def score(self, key: Callable[[int], int]) -> None:
+        """Fills the score of every move with ``key(move)``."""
+        scores = self.scores
+        del scores[:]
+        scores.extend(map(key, self.moves))
+
+    def pick(self, i: int) -> int:
+        """Swaps the best scored move at or after index ``i`` into ``i`` and returns it."""
+        moves, scores = self.moves, self.scores
+        j = scores.index(max(islice(scores, i, None)), i)
+        if j != i:
+            moves[i], moves[j] = moves[j], moves[i]
+            scores[i], scores[j] = scores[j], scores[i]
+        return moves[i]
 
-    def __next__(self):
-        return iter(self)
+    def iterbest(self) -> Iterator[int]:
+        """Yields the moves best score first, sorting only as far as the caller consumes."""
+        for i in range(len(self.moves)):
+            yield self.pick(i)
 
-    def sort(self):
-        pass
+    def sort(self) -> None:
+        for i in range(len(self.moves)):
+            self.pick(i)
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.moves)
+
+    def __getitem__(self, i: int) -> int:
+        return self.moves[i]
+
+    def __contains__(self, move: int) -> bool:
+        return move in self.moves
+
+    def __repr__(self) -> str:
+        return f"MoveList({[MOVES[move] for move in self.moves]})"
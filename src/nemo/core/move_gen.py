@@ -29,15 +29,15 @@ from .types import (
 from .utils import rank_mask, file_mask, diag_mask, antidiag_mask
 from typing import Tuple
 
-NOT_A = ~Files.A
-NOT_AB = ~Bitboard(Files.A | Files.B)
-NOT_H = ~Files.H
-NOT_GH = ~Bitboard(Files.G | Files.H)
+NOT_A = MAX_INT ^ Files.A
+NOT_AB = MAX_INT ^ (Files.A | Files.B)
+NOT_H = MAX_INT ^ Files.H
+NOT_GH = MAX_INT ^ (Files.G | Files.H)
 
 # One steps
-n_one = lambda s: (s << NORTH)
+n_one = lambda s: (s << NORTH & MAX_INT)
 s_one = lambda s: (s >> NORTH)
-n_two = lambda s: (s << 16)
+n_two = lambda s: (s << 16 & MAX_INT)
 s_two = lambda s: (s >> 16)
 
 e_one = lambda s: (s << EAST & NOT_A)
@@ -60,8 +60,8 @@ STEPS = [
 ]
 
 def ring(s: Square) -> Bitboard:
-    _bb = Bitboard(1 << s)
-    bb = Bitboard(0)
+    _bb = 1 << s
+    bb = EMPTY
     for step in STEPS:
         bb |= step(_bb)
     return bb
@@ -84,7 +84,7 @@ def relative_eigth_rank_bb(color: Color) -> Bitboard:
 
 
 def relative_south(color: Color, bb: Bitboard) -> Bitboard:
-    return bb >> 8 if color == Color.WHITE else bb << 8
+    return bb >> 8 if color == Color.WHITE else bb << 8 & MAX_INT
 
 
 def square_below(color: Color, s: Square) -> int:
@@ -191,11 +191,11 @@ diag_mask_ex = lambda s: (1 << s) ^ diag_mask(s)
 antidiag_mask_ex = lambda s: (1 << s) ^ antidiag_mask(s)
 
 
-ROOK_ATTACKS = [Bitboard(rank_mask_ex(s) | file_mask_ex(s)) for s in range(64)]
-BISHOP_ATTACKS = [Bitboard(diag_mask_ex(s) | antidiag_mask_ex(s)) for s in range(64)]
-QUEEN_ATTACKS = [Bitboard(BISHOP_ATTACKS[s] | ROOK_ATTACKS[s]) for s in range(64)]
-KNIGHT_ATTACKS = [Bitboard(knight_attacks(s)) for s in range(64)]
-KING_ATTACKS = [Bitboard(king_attacks(s)) for s in range(64)]
+ROOK_ATTACKS = [rank_mask_ex(s) | file_mask_ex(s) for s in range(64)]
+BISHOP_ATTACKS = [diag_mask_ex(s) | antidiag_mask_ex(s) for s in range(64)]
+QUEEN_ATTACKS = [BISHOP_ATTACKS[s] | ROOK_ATTACKS[s] for s in range(64)]
+KNIGHT_ATTACKS = [knight_attacks(s) for s in range(64)]
+KING_ATTACKS = [king_attacks(s) for s in range(64)]
 PAWN_ATTACKS = [
     white_pawns_all_attack_mask,
     black_pawns_all_attack_mask,
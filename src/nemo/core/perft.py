@@ -1,15 +1,25 @@
+from concurrent.futures import ProcessPoolExecutor
 from json import dumps
+from multiprocessing import get_context
+from time import time
+from typing import Dict, List, Optional, Union
 
 from .constants import STARTING_FEN
-from .move import MoveFlags
+from .move import CAPTURE_FLAG, FLAGS_SHIFT, MOVES, PROMOTION_FLAG, MoveFlags
 from .position import Position
+from .types import PositionSnapshot
+from .transposition import _PerftTable
+from .utils import BACKEND
 
 
 class NodeStat:
     ATTRS = ("nodes", "captures", "ep", "castles", "promotions", "checks", "checkmates")
+    backend = BACKEND  # "cffi" or "python", so timings say which bit helpers they measured
 
     def __init__(self, n=0):
         self.nodes = n
+        self.elapsed = 0.0
+        self.detailed = False  # whether the per-leaf breakdown below was collected
         self.captures = 0
         self.ep = 0
         self.castles = 0
@@ -17,13 +27,12 @@ class NodeStat:
         self.checks = 0
         self.checkmates = 0
 
-    def update_from_move(self, move: "Move", position: Position) -> None:
-        self.castles += bool(
-            move.flags in (MoveFlags.KINGSIDE_CASTLE, MoveFlags.QUEENSIDE_CASTLE)
-        )
-        self.captures += bool(move.is_capture)
-        self.ep += bool(move.is_enpassant_capture)
-        self.promotions += bool(move.is_promotion)
+    def update_from_move(self, move: int, position: Position) -> None:
+        flags = move >> FLAGS_SHIFT
+        self.castles += flags == MoveFlags.KINGSIDE_CASTLE or flags == MoveFlags.QUEENSIDE_CASTLE
+        self.captures += bool(move & CAPTURE_FLAG)
+        self.ep += flags == MoveFlags.ENPASSANT_CAPTURE
+        self.promotions += bool(move & PROMOTION_FLAG)
         self.checks += bool(position.is_check())
         self.checkmates += bool(position.is_checkmate())
         return self
@@ -34,24 +43,166 @@ class NodeStat:
             setattr(self, k, x + y)
         return self
 
+    @property
+    def knps(self) -> float:
+        return self.nodes / 1000 / self.elapsed if self.elapsed else 0.0
+
     def __str__(self) -> str:
+        attrs = self.ATTRS if self.detailed else self.ATTRS[:1]
         return dumps(
-            {k: getattr(self, k, 0) for k in self.ATTRS},
+            {
+                **{k: getattr(self, k, 0) for k in attrs},
+                "seconds": round(self.elapsed, 3),
+                "knps": round(self.knps, 2),
+                "backend": self.backend,
+            },
             separators=(",", ": "),
             indent=4,
         )
 
 
-def perft(depth: int = 1, fen=STARTING_FEN, position=None, move=None) -> NodeStat:
+def perft(
+    depth: int = 1,
+    fen=STARTING_FEN,
+    position=None,
+    verify=False,
+    copy_make=False,
+    stats=False,
+    hash_mb=0,
+    workers=1,
+) -> NodeStat:
+    """Counts the leaf nodes ``depth`` plies below the position.
+
+    By default only nodes are counted, and the last ply is the length of the legal move list
+    rather than a make/unmake of every leaf. With ``stats`` every leaf is made and classified
+    into captures, castles, checks, mates and so on, which regenerates the moves at each leaf.
+    With ``verify``, the incrementally maintained pins and checkers are checked against a full
+    recomputation after every make and unmake, which also makes every leaf. With ``copy_make``,
+    every child is a ``Position.apply`` copy instead of a make/unmake of the one position.
+    With ``hash_mb``, subtree counts are cached in a table of that many megabytes, so
+    transpositions are counted once; only plain node counting can be hashed. With ``workers``
+    above 1, the root moves are counted in that many processes, as by ``divide``.
+    """
+    assert not (hash_mb and (stats or verify)), "hashed perft only counts nodes"
+    assert not (workers > 1 and (stats or verify)), "parallel perft only counts nodes"
     position = position or Position(fen=fen)
-    moves = list(position.legal_moves)
-    n = NodeStat()
+    start = time()
+    if workers > 1 and depth > 1:
+        counts = divide(depth, position=position, copy_make=copy_make, hash_mb=hash_mb, workers=workers)
+        n = NodeStat(sum(counts.values()))
+    elif stats or verify:
+        n = _perft_stats(depth, position, None, verify, copy_make)
+        n.detailed = stats
+    elif hash_mb:
+        n = NodeStat(_perft_hashed(depth, position, copy_make, _PerftTable(hash_mb)))
+    else:
+        n = NodeStat(_perft_count(depth, position, copy_make))
+    n.elapsed = time() - start
+    return n
+
+
+def _perft_count(depth: int, position: Position, copy_make: bool) -> int:
     if not depth:
-        return NodeStat(1).update_from_move(move, position)
+        return 1
+    moves = position.legal_moves
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    if copy_make:
+        for move in moves:
+            nodes += _perft_count(depth - 1, position.apply(move), True)
+        return nodes
     for move in moves:
-        zk_before = position.key
         position.make_move(move)
-        n += perft(depth - 1, position=position, move=move)
+        nodes += _perft_count(depth - 1, position, False)
+        position.unmake_move(move)
+    return nodes
+
+
+def _perft_hashed(depth: int, position: Position, copy_make: bool, table: _PerftTable) -> int:
+    if depth < 2:
+        return len(position.legal_moves) if depth else 1
+    key = position.key
+    nodes = table.get(key, depth)
+    if nodes is not None:
+        return nodes
+    nodes = 0
+    if copy_make:
+        for move in position.legal_moves:
+            nodes += _perft_hashed(depth - 1, position.apply(move), True, table)
+    else:
+        for move in position.legal_moves:
+            position.make_move(move)
+            nodes += _perft_hashed(depth - 1, position, False, table)
+            position.unmake_move(move)
+    table.store(key, depth, nodes)
+    return nodes
+
+
+def _perft_stats(depth: int, position: Position, move, verify: bool, copy_make: bool) -> NodeStat:
+    if verify:
+        position.boards.check_pins_and_checkers()
+    if not depth:
+        return NodeStat(1).update_from_move(move, position) if move is not None else NodeStat(1)
+    n = NodeStat()
+    for move in position.legal_moves:
+        if copy_make:
+            n += _perft_stats(depth - 1, position.apply(move), move, verify, True)
+            continue
+        position.make_move(move)
+        n += _perft_stats(depth - 1, position, move, verify, False)
         position.unmake_move(move)
-        _ = 1
+        if verify:
+            position.boards.check_pins_and_checkers()
     return n
+
+
+_worker_table = None
+
+
+def _init_worker(hash_mb: int) -> None:
+    global _worker_table
+    _worker_table = _PerftTable(hash_mb) if hash_mb else None
+
+
+def _count(depth: int, position: Position, copy_make: bool, table: Optional[_PerftTable]) -> int:
+    if table is None:
+        return _perft_count(depth, position, copy_make)
+    return _perft_hashed(depth, position, copy_make, table)
+
+
+def _perft_subtree(
+    root: Union[str, PositionSnapshot], moves: List[int], depth: int, copy_make: bool
+) -> int:
+    return _count(depth, Position.from_moves(root, moves), copy_make, _worker_table)
+
+
+def divide(
+    depth: int = 1, fen=STARTING_FEN, position=None, copy_make=False, hash_mb=0, workers=1
+) -> Dict[str, int]:
+    """Node counts ``depth`` plies below the position for each root move, keyed by UCI move.
+
+    With ``workers`` above 1, the root moves are spread over a process pool. Each worker
+    replays the position from its root and move history, as for the SMP helpers, and keeps
+    its own ``hash_mb`` table across the subtrees it counts.
+    """
+    assert depth >= 1, "divide needs at least one ply"
+    position = position or Position(fen=fen)
+    moves = [int(move) for move in position.legal_moves]
+    if workers < 2:
+        table = _PerftTable(hash_mb) if hash_mb else None
+        counts = {}
+        for move in moves:
+            position.make_move(move)
+            counts[MOVES[move].uci] = _count(depth - 1, position, copy_make, table)
+            position.unmake_move(move)
+        return counts
+
+    root, history = position.history
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context(), initializer=_init_worker, initargs=(hash_mb,)
+    ) as pool:
+        futures = [
+            pool.submit(_perft_subtree, root, history + [move], depth - 1, copy_make) for move in moves
+        ]
+        return {MOVES[move].uci: future.result() for move, future in zip(moves, futures)}
@@ -0,0 +1,270 @@
+"""Perft regression and throughput suite over standard positions.
+
+Run ``python -m nemo.core.perft_suite`` from ``src``. Every position is counted at each depth
+up to ``--depth`` for which its node count is known, and a wrong count fails the run. The
+deepest count of each position is timed for kN/s, which ``--baseline`` compares against a
+saved report, failing when a position slows down by more than ``--threshold``.
+"""
+from argparse import ArgumentParser
+from json import dumps, load
+from typing import Dict, List, NamedTuple, Optional
+
+from .perft import perft
+from .utils import BACKEND
+
+
+MIN_TIMED_SECONDS = 0.1  # quicker runs are too noisy to compare against a baseline
+COMPARED_SETTINGS = ("backend", "hash_mb", "workers")  # must match for kN/s to be comparable
+
+
+class PerftPosition(NamedTuple):
+    name: str
+    fen: str
+    counts: Dict[int, int]  # known node counts by depth
+
+
+PERFT_SUITE = (
+    PerftPosition(
+        "start",
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609},
+    ),
+    PerftPosition(
+        "kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        {1: 48, 2: 2039, 3: 97862, 4: 4085603},
+    ),
+    PerftPosition(
+        "position3",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624},
+    ),
+    PerftPosition(
+        "position4",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        {1: 6, 2: 264, 3: 9467, 4: 422333},
+    ),
+    PerftPosition(
+        "position4_mirrored",
+        "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+        {1: 6, 2: 264, 3: 9467, 4: 422333},
+    ),
+    PerftPosition(
+        "position5",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        {1: 44, 2: 1486, 3: 62379, 4: 2103487},
+    ),
+    PerftPosition(
+        "position6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        {1: 46, 2: 2079, 3: 89890, 4: 3894594},
+    ),
+    # en passant, castling and promotion edge cases
+    PerftPosition(
+        "illegal_ep_1",
+        "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+        {1: 18, 2: 92, 3: 1670, 4: 10138, 5: 185429, 6: 1134888},
+    ),
+    PerftPosition(
+        "illegal_ep_2",
+        "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+        {1: 13, 2: 102, 3: 1266, 4: 10276, 5: 135655, 6: 1015133},
+    ),
+    PerftPosition(
+        "ep_gives_check",
+        "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+        {1: 15, 2: 126, 3: 1928, 4: 13931, 5: 206379, 6: 1440467},
+    ),
+    PerftPosition(
+        "short_castle_check",
+        "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+        {1: 15, 2: 66, 3: 1198, 4: 6399, 5: 120330, 6: 661072},
+    ),
+    PerftPosition(
+        "long_castle_check",
+        "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+        {1: 16, 2: 71, 3: 1286, 4: 7418, 5: 141077, 6: 803711},
+    ),
+    PerftPosition(
+        "castle_rights",
+        "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+        {1: 26, 2: 1141, 3: 27826, 4: 1274206},
+    ),
+    PerftPosition(
+        "castle_prevented",
+        "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+        {1: 44, 2: 1494, 3: 50509, 4: 1720476},
+    ),
+    PerftPosition(
+        "promote_out_of_check",
+        "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+        {1: 11, 2: 133, 3: 1442, 4: 19174, 5: 266199, 6: 3821001},
+    ),
+    PerftPosition(
+        "discovered_check",
+        "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+        {1: 29, 2: 165, 3: 5160, 4: 31961, 5: 1004658},
+    ),
+    PerftPosition(
+        "promote_check",
+        "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+        {1: 9, 2: 40, 3: 472, 4: 2661, 5: 38983, 6: 217342},
+    ),
+    PerftPosition(
+        "underpromote_check",
+        "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+        {1: 6, 2: 27, 3: 273, 4: 1329, 5: 18135, 6: 92683},
+    ),
+    PerftPosition(
+        "self_stalemate",
+        "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+        {1: 2, 2: 6, 3: 13, 4: 63, 5: 382, 6: 2217},
+    ),
+    PerftPosition(
+        "stalemate_checkmate_1",
+        "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+        {1: 10, 2: 25, 3: 268, 4: 926, 5: 10857, 6: 43261, 7: 567584},
+    ),
+    PerftPosition(
+        "stalemate_checkmate_2",
+        "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+        {1: 37, 2: 183, 3: 6559, 4: 23527},
+    ),
+)
+
+
+def run_suite(
+    depth: int = 3,
+    names: Optional[List[str]] = None,
+    hash_mb: int = 0,
+    workers: int = 1,
+    repeat: int = 3,
+) -> dict:
+    """Counts every suite position up to ``depth`` and returns the report.
+
+    The deepest count is run ``repeat`` times and the quickest run is kept, to damp noise.
+
+    Only the node counts of hashed or parallel runs are checked; their kN/s isn't comparable
+    with a plain run, so keep baselines to one kind.
+    """
+    results = []
+    for position in PERFT_SUITE:
+        if names and position.name not in names:
+            continue
+        depths = [d for d in sorted(position.counts) if d <= depth]
+        if not depths:
+            continue
+        mismatches = {}
+        for d in depths:
+            n = perft(d, fen=position.fen, hash_mb=hash_mb, workers=workers)
+            if n.nodes != position.counts[d]:
+                mismatches[d] = n.nodes
+        for _ in range(repeat - 1):
+            rerun = perft(depths[-1], fen=position.fen, hash_mb=hash_mb, workers=workers)
+            n = rerun if rerun.elapsed < n.elapsed else n
+        results.append(
+            {
+                "name": position.name,
+                "fen": position.fen,
+                "depth": depths[-1],
+                "nodes": n.nodes,
+                "seconds": round(n.elapsed, 3),
+                "knps": round(n.knps, 2),
+                "ok": not mismatches,
+                "mismatches": mismatches,
+            }
+        )
+    nodes = sum(result["nodes"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    return {
+        "backend": BACKEND,
+        "hash_mb": hash_mb,
+        "workers": workers,
+        "positions": results,
+        "nodes": nodes,
+        "seconds": round(seconds, 3),
+        "knps": round(nodes / 1000 / seconds, 2) if seconds else 0.0,
+        "ok": all(result["ok"] for result in results),
+    }
+
+
+def compare_to_baseline(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Describes every position, and the suite total, that ran more than ``threshold`` slower
+    than in ``baseline``.
+
+    Both reports must come from the same backend, hash size and worker count, or a
+    ``ValueError`` is raised. Positions are matched by name and depth, and the total is summed
+    over the matched positions only. Ones timed for less than ``MIN_TIMED_SECONDS`` in either
+    report are only counted in the total.
+    """
+    for field in COMPARED_SETTINGS:
+        if report[field] != baseline[field]:
+            raise ValueError(
+                f"baseline {field} {baseline[field]} doesn't match {report[field]}, the kN/s aren't comparable"
+            )
+    previous = {(result["name"], result["depth"]): result for result in baseline["positions"]}
+    regressions = []
+    nodes = seconds = before_nodes = before_seconds = 0
+    for result in report["positions"]:
+        before = previous.get((result["name"], result["depth"]))
+        if before is None:
+            continue
+        nodes += result["nodes"]
+        seconds += result["seconds"]
+        before_nodes += before["nodes"]
+        before_seconds += before["seconds"]
+        if min(result["seconds"], before["seconds"]) < MIN_TIMED_SECONDS:
+            continue
+        if result["knps"] < before["knps"] * (1 - threshold):
+            regressions.append(
+                f"{result['name']} depth {result['depth']}: {result['knps']} kN/s, was {before['knps']}"
+            )
+    if min(seconds, before_seconds) >= MIN_TIMED_SECONDS:
+        knps = round(nodes / 1000 / seconds, 2)
+        before_knps = round(before_nodes / 1000 / before_seconds, 2)
+        if knps < before_knps * (1 - threshold):
+            regressions.append(f"total: {knps} kN/s, was {before_knps}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> None:
+    parser = ArgumentParser(description="Checks perft counts and throughput over standard positions.")
+    parser.add_argument("--depth", type=int, default=3, help="deepest depth to count")
+    parser.add_argument("--position", action="append", dest="names", help="only run these positions")
+    parser.add_argument("--hash", type=int, default=0, dest="hash_mb", help="perft hash in MB")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="time the deepest count this often")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="compare kN/s against this saved report")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed kN/s loss, 0.1 is 10%%")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.depth, args.names, args.hash_mb, args.workers, args.repeat)
+    for result in report["positions"]:
+        status = "ok" if result["ok"] else f"MISMATCH {result['mismatches']}"
+        print(
+            f"{result['name']:20} depth={result['depth']} nodes={result['nodes']:<9} "
+            f"{result['seconds']:8.3f}s {result['knps']:8.2f} kN/s {status}"
+        )
+    print(f"total nodes={report['nodes']} {report['seconds']}s {report['knps']} kN/s ({report['backend']})")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = load(fp)
+        try:
+            regressions = compare_to_baseline(report, baseline, args.threshold)
+        except ValueError as e:
+            parser.error(str(e))
+        report["regressions"] = regressions
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+    if args.output:
+        with open(args.output, "w") as fp:
+            fp.write(dumps(report, indent=4))
+    if not report["ok"] or regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
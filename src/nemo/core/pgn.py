@@ -1,3 +1,4 @@
+from .move import MOVES
 from .types import INV_PIECE_TYPE_MAP, Squares, PieceType
 from .utils import iter_bitscan_forward, popcnt, pairwise
 # from .position import Position
@@ -69,19 +70,19 @@ class PGNWriter:
 
     def itermoves(self):
         it = iter(self.__position.state)
-        ply = self.__position.state.ply
-        p = self.__position_class(fen=next(it).fen)
+        next(it)  # the root has no move
+        p = self.__position_class(fen=self.__position.root_fen)
 
         for i, states in enumerate(pairwise(it)):
             first, second = states
-            move = first.move
+            move = MOVES[first.move]
             suffix = move.san_suffix
             piece, _from = p.make_move(move)
             san_str = self.to_san(move, piece, p)
             if second is None:
                 yield f"{i + 1}. {san_str} "
             else:
-                move = second.move
+                move = MOVES[second.move]
                 piece, _from = p.make_move(move)
                 second_san_str = self.to_san(move, piece, p)
                 yield f"{i + 1}. {san_str} {second_san_str}"
@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
+from array import array
 from functools import reduce
 from operator import ior
-from typing import List, Generator
+from typing import Generator
 
-from .constants import NE, NORTH, NW, SE, SOUTH, SW
-from .move import Move, MoveFlags
+from .constants import MAX_INT, NE, NORTH, NW, SE, SOUTH, SW
+from .move import CAPTURE_FLAG, FROM_SHIFT, MoveArray, MoveFlags, MoveList, encode
 from .move_gen import (
     BISHOP_ATTACKS,
     KING_ATTACKS,
@@ -23,7 +24,7 @@ from .move_gen import (
     relative_rook_squares,
     relative_south,
 )
-from .magic import Magic
+from .magic import BETWEEN, LINE, Magic
 from .types import (
     EMPTY,
     PIECE_REGISTRY,
@@ -53,49 +54,77 @@ class Piece(AbstractPiece):
 
     def captures(
         self, bitboards: StackedBitboard, checks_bb: Bitboard = UNIVERSE, state: State = None
-    ) -> List[Move]:
-        return [
-            *self._captures(
+    ) -> MoveArray:
+        return array(
+            "H",
+            self._captures(
                 self.color, bitboards.board_for(self), bitboards, checks_bb=checks_bb, state=state
-            )
-        ]
+            ),
+        )
 
     def quiet_moves(
         self, bitboards: StackedBitboard, checks_bb: Bitboard = UNIVERSE, state: State = None
-    ) -> List[Move]:
-        return [
-            *self._quiet_moves(
+    ) -> MoveArray:
+        return array(
+            "H",
+            self._quiet_moves(
                 self.color, bitboards.board_for(self), bitboards, checks_bb=checks_bb, state=state
-            )
-        ]
+            ),
+        )
 
-    def pseudo_legal_moves(self, bitboards: StackedBitboard, state: State) -> List[Move]:
-        return [*self.captures(bitboards, state=state), *self.quiet_moves(bitboards, state=state)]
+    def pseudo_legal_moves(self, bitboards: StackedBitboard, state: State) -> MoveArray:
+        return self.captures(bitboards, state=state) + self.quiet_moves(bitboards, state=state)
 
-    def legal_moves(self, bitboards: StackedBitboard, state: State) -> List[Move]:
+    def legal_moves(
+        self, bitboards: StackedBitboard, state: State, move_list: MoveList = None
+    ) -> MoveList:
+        """Appends the legal moves of this piece type to ``move_list``."""
+        move_list = MoveList() if move_list is None else move_list
+        board = bitboards.board_for(self)
         if bitboards.king_in_double_check(self.color):
-            return (
-                [
-                    *self.captures(bitboards, state=state),
-                    *self.quiet_moves(bitboards, state=state)
-                ] if self._type == PieceType.KING else []
-            )
+            if self._type == PieceType.KING:
+                move_list.extend(self._captures(self.color, board, bitboards, checks_bb=UNIVERSE, state=state))
+                move_list.extend(self._quiet_moves(self.color, board, bitboards, checks_bb=UNIVERSE, state=state))
+            return move_list
         checks_bb = bitboards.checkers(self.color)
-        return [
-            *self.captures(bitboards, checks_bb=checks_bb, state=state),
-            *self.quiet_moves(bitboards, checks_bb=checks_bb, state=state),
-        ]
-
-    def legal_captures(self, bitboards: StackedBitboard, state: State) -> List[Move]:
+        move_list.extend(self._captures(self.color, board, bitboards, checks_bb=checks_bb, state=state))
+        move_list.extend(self._quiet_moves(self.color, board, bitboards, checks_bb=checks_bb, state=state))
+        return move_list
+
+    def legal_captures(
+        self, bitboards: StackedBitboard, state: State, move_list: MoveList = None
+    ) -> MoveList:
+        move_list = MoveList() if move_list is None else move_list
         if bitboards.king_in_double_check(self.color):
-            return []
+            return move_list
         checks_bb = bitboards.checkers(self.color)
-        return [*self.captures(bitboards, checks_bb=checks_bb, state=state)]
-
-    def legal_quiet(self, bitboards: StackedBitboard, state: State) -> List[Move]:
+        move_list.extend(
+            self._captures(self.color, bitboards.board_for(self), bitboards, checks_bb=checks_bb, state=state)
+        )
+        return move_list
+
+    def legal_quiet(
+        self, bitboards: StackedBitboard, state: State, move_list: MoveList = None
+    ) -> MoveList:
+        move_list = MoveList() if move_list is None else move_list
+        if bitboards.king_in_double_check(self.color) and self._type != PieceType.KING:
+            return move_list
         checks_bb = bitboards.checkers(self.color)
-        return [*self.quiet_moves(bitboards, checks_bb=checks_bb, state=state)]
-
+        move_list.extend(
+            self._quiet_moves(self.color, bitboards.board_for(self), bitboards, checks_bb=checks_bb, state=state)
+        )
+        return move_list
+
+    def is_legal(self, move: int, bitboards: StackedBitboard, state: State) -> bool:
+        """Whether ``move`` is legal for this piece, generating moves from its origin square only."""
+        if bitboards.king_in_double_check(self.color) and self._type != PieceType.KING:
+            return False
+        from_bb = bitboards.board_for(self) & (1 << ((move >> FROM_SHIFT) & 63))
+        if not from_bb:
+            return False
+        checks_bb = bitboards.checkers(self.color)
+        generator = self._captures if move & CAPTURE_FLAG else self._quiet_moves
+        return move in generator(self.color, from_bb, bitboards, checks_bb=checks_bb, state=state)
 
     def attack_set_empty(self, bitboards: StackedBitboard, *args) -> Bitboard:
         return self._attack_set_empty(self.color, bitboards.board_for(self), bitboards, *args)
@@ -104,24 +133,22 @@ class Piece(AbstractPiece):
         return self._attack_set(self.color, bitboards.board_for(self), bitboards)
 
     def attack_set_on(self, bitboards: StackedBitboard, s: Square) -> Bitboard:
-        return self._attack_set(self.color, bitboards.board_for(self), bitboards, Bitboard(1 << s))
+        return self._attack_set(self.color, bitboards.board_for(self), bitboards, 1 << s)
 
     def defend_set_empty(self, bitboards: StackedBitboard, s: Square) -> Bitboard:
-        return self._defend_set(self.color, bitboards.board_for(self), bitboards, Bitboard(1 << s))
+        return self._defend_set(self.color, bitboards.board_for(self), bitboards, 1 << s)
 
     @staticmethod
     def get_pin_mask(c: Color, _from: Square, bitboards: StackedBitboard) -> Bitboard:
-        king_sq = bitscan_forward(bitboards.king_bb(c))
-        return (
-            Magic.get_pin_mask(king_sq, _from)
-            if Square(_from).bitboard & bitboards.pinned_bb(c)
-            else UNIVERSE
-        )
+        if not (1 << _from) & bitboards.pinned_bb(c):
+            return UNIVERSE
+        return LINE[bitscan_forward(bitboards.king_bb(c)) * 64 + _from]
 
     @staticmethod
     def get_check_mask(c: Color, checks_bb: Bitboard, bitboards: StackedBitboard) -> Bitboard:
-        king_sq = bitscan_forward(bitboards.king_bb(c))
-        return Magic.get_ray_mask(king_sq, bitscan_forward(checks_bb)) if checks_bb else UNIVERSE
+        if not checks_bb:
+            return UNIVERSE
+        return BETWEEN[bitscan_forward(bitboards.king_bb(c)) * 64 + bitscan_forward(checks_bb)]
 
 
 class Enpassant(Piece):
@@ -129,13 +156,13 @@ class Enpassant(Piece):
 
     @staticmethod
     def _attack_set_empty(*args, **kwargs):
-        return Bitboard(0)
+        return EMPTY
 
     def captures(self, *args):
-        return []
+        return array("H")
 
     def quiet_moves(self, *args):
-        return []
+        return array("H")
 
 
 class Pawn(Piece):
@@ -164,7 +191,7 @@ class Pawn(Piece):
     @staticmethod
     def _captures(
         c: Color, pawns: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard, state: State
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_ep_board = bitboards.ep_board(~c)
         other_occupancy = bitboards.by_color(~c) | other_ep_board
         king_sq = bitscan_forward(bitboards.king_bb(c))
@@ -172,35 +199,55 @@ class Pawn(Piece):
         forced_attack_set = UNIVERSE if checks_bb == EMPTY else checks_bb
 
         for pawn_bb in iter_lsb(pawns):
-            _from = next(iter_bitscan_forward(pawn_bb))
+            _from = bitscan_forward(pawn_bb)
             pin_mask = Piece.get_pin_mask(c, _from, bitboards)
-            attack_set = PAWN_ATTACKS[c](pawn_bb) & other_occupancy & pin_mask & forced_attack_set
-            promotion_attack_set = attack_set & relative_eigth_rank_bb(c)
+            attack_set = PAWN_ATTACKS[c](pawn_bb) & other_occupancy & pin_mask
+            # the check mask doesn't hold the ep target, and removing two pawns from one rank
+            # can uncover the king, so en passant captures are tested on their own below
             enpassant_attack_set = attack_set & other_ep_board
+            attack_set &= forced_attack_set & ~enpassant_attack_set
+            promotion_attack_set = attack_set & relative_eigth_rank_bb(c)
             attack_set &= ~promotion_attack_set
-            attack_set &= ~enpassant_attack_set
 
             for _to in iter_bitscan_forward(promotion_attack_set):
 
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_Q_CAPTURE)
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_N_CAPTURE)
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_R_CAPTURE)
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_B_CAPTURE)
+                yield encode(_from, _to, MoveFlags.PROMOTION_Q_CAPTURE)
+                yield encode(_from, _to, MoveFlags.PROMOTION_N_CAPTURE)
+                yield encode(_from, _to, MoveFlags.PROMOTION_R_CAPTURE)
+                yield encode(_from, _to, MoveFlags.PROMOTION_B_CAPTURE)
 
-            for _to in iter_bitscan_forward(enpassant_attack_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.ENPASSANT_CAPTURE)
+            if enpassant_attack_set and (
+                checks_bb == UNIVERSE  # pseudo-legal generation
+                or Pawn._enpassant_is_legal(c, king_sq, pawn_bb, enpassant_attack_set, bitboards, checks_bb)
+            ):
+                yield encode(_from, bitscan_forward(enpassant_attack_set), MoveFlags.ENPASSANT_CAPTURE)
 
             for _to in iter_bitscan_forward(attack_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.CAPTURES)
+                yield CAPTURE_FLAG | (_from << FROM_SHIFT) | _to
+
+    @staticmethod
+    def _enpassant_is_legal(
+        c: Color, king_sq: Square, from_bb: Bitboard, to_bb: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard
+    ) -> bool:
+        """Whether the king is safe once the pawn on ``from_bb`` takes en passant on ``to_bb``."""
+        captured_bb = relative_south(c, to_bb)
+        occupied = (bitboards.occupancy ^ from_bb ^ captured_bb) | to_bb
+        boards, o = bitboards.boards, (~c) * 8
+        queens = boards[o + PieceType.QUEEN]
+        if Magic.rook_attacks(king_sq, occupied) & (boards[o + PieceType.ROOK] | queens):
+            return False
+        if Magic.bishop_attacks(king_sq, occupied) & (boards[o + PieceType.BISHOP] | queens):
+            return False
+        return not checks_bb & ~captured_bb & (boards[o + PieceType.KNIGHT] | boards[o + PieceType.PAWN])
 
     @staticmethod
     def _quiet_moves(
         c: Color, pawns: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard, state: State
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         occupancy, other_occupancy = bitboards.by_color(c), bitboards.by_color(~c)
 
         occupied_bb = occupancy | other_occupancy
-        empty = ~occupied_bb
+        empty = MAX_INT ^ occupied_bb
 
         king_sq = bitscan_forward(bitboards.king_bb(c))
         pawns_not_pinned = pawns & ~(pawns & bitboards.pinned_bb(c) & ~(file_mask(king_sq)))
@@ -221,16 +268,16 @@ class Pawn(Piece):
 
         for _to in iter_bitscan_forward(promotions & check_mask):
             _from = _to - SINGLE_PUSH_DIR
-            yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_N)
-            yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_Q)
-            yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_R)
-            yield Move(_from=_from, _to=_to, flags=MoveFlags.PROMOTION_B)
+            yield encode(_from, _to, MoveFlags.PROMOTION_N)
+            yield encode(_from, _to, MoveFlags.PROMOTION_Q)
+            yield encode(_from, _to, MoveFlags.PROMOTION_R)
+            yield encode(_from, _to, MoveFlags.PROMOTION_B)
 
         for _to in iter_bitscan_forward(double_pawn_pushes & check_mask):
-            yield Move(_from=_to - DOUBLE_PUSH_DIR, _to=_to, flags=MoveFlags.DOUBLE_PAWN_PUSH)
+            yield encode(_to - DOUBLE_PUSH_DIR, _to, MoveFlags.DOUBLE_PAWN_PUSH)
 
         for _to in iter_bitscan_forward(single_pawn_pushes & check_mask):
-            yield Move(_from=_to - SINGLE_PUSH_DIR, _to=_to, flags=MoveFlags.QUIET)
+            yield ((_to - SINGLE_PUSH_DIR) << FROM_SHIFT) | _to
 
 
 class Knight(Piece):
@@ -264,7 +311,7 @@ class Knight(Piece):
     @staticmethod
     def _captures(
         c: Color, knights: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard, state: State
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_occupancy = bitboards.by_color(~c)
         forced_attack_set = UNIVERSE if checks_bb == EMPTY else checks_bb
 
@@ -273,14 +320,14 @@ class Knight(Piece):
                 continue
             attack_set = KNIGHT_ATTACKS[_from] & other_occupancy & forced_attack_set
             for _to in iter_bitscan_forward(attack_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.CAPTURES)
+                yield CAPTURE_FLAG | (_from << FROM_SHIFT) | _to
 
     @staticmethod
     def _quiet_moves(
         c: Color, knights: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard, state: State
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_occupancy = bitboards.by_color(~c)
-        unoccupied = ~(bitboards.by_color(c) | other_occupancy)
+        unoccupied = MAX_INT ^ (bitboards.by_color(c) | other_occupancy)
         check_mask = Piece.get_check_mask(c, checks_bb, bitboards)
 
         for _from in iter_bitscan_forward(knights):
@@ -288,7 +335,7 @@ class Knight(Piece):
                 continue
             jump_set = KNIGHT_ATTACKS[_from] & unoccupied & check_mask
             for _to in iter_bitscan_forward(jump_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.QUIET)
+                yield (_from << FROM_SHIFT) | _to
 
 
 class King(Piece):
@@ -322,28 +369,28 @@ class King(Piece):
     @staticmethod
     def _captures(
         c: Color, kings: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard, state: State
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_occupancy = bitboards.by_color(~c)
-        unattacked = ~(bitboards.attacks_by_color(~c))
+        unattacked = MAX_INT ^ bitboards.attacks_by_color(~c)
 
         attack_set = UNIVERSE
 
         for _from in iter_bitscan_forward(kings):
             attack_set &= KING_ATTACKS[_from] & other_occupancy & unattacked
             for _to in iter_bitscan_forward(attack_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.CAPTURES)
+                yield CAPTURE_FLAG | (_from << FROM_SHIFT) | _to
 
     @staticmethod
     def _quiet_moves(
         c: Color, king_bb: Bitboard, bitboards: StackedBitboard, checks_bb: Bitboard, state: State
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_occupancy = bitboards.by_color(~c)
-        unoccupied = ~(bitboards.by_color(c) | other_occupancy)
-        unattacked = ~(bitboards.attacks_by_color(~c))
+        unoccupied = MAX_INT ^ (bitboards.by_color(c) | other_occupancy)
+        unattacked = MAX_INT ^ bitboards.attacks_by_color(~c)
         _from = bitscan_forward(king_bb)
         move_set = KING_ATTACKS[_from] & unoccupied & unattacked
         for _to in iter_bitscan_forward(move_set):
-            yield Move(_from=_from, _to=_to, flags=MoveFlags.QUIET)
+            yield (_from << FROM_SHIFT) | _to
 
         castling_rights = state.castling_rights[c]
         if castling_rights and ((1 << _from) & Files.E) and checks_bb == EMPTY:
@@ -367,7 +414,7 @@ class King(Piece):
                 and kr._type == PieceType.ROOK
                 and kr.color == c
             ):
-                yield Move(_from, krsq - 1, flags=MoveFlags.KINGSIDE_CASTLE)
+                yield encode(_from, krsq - 1, MoveFlags.KINGSIDE_CASTLE)
             if (
                 castling_rights & 2
                 and ooo_clear
@@ -376,7 +423,7 @@ class King(Piece):
                 and qr._type == PieceType.ROOK
                 and qr.color == c
             ):
-                yield Move(_from, qrsq + 2, flags=MoveFlags.QUEENSIDE_CASTLE)
+                yield encode(_from, qrsq + 2, MoveFlags.QUEENSIDE_CASTLE)
 
 
 # SLIDING PIECES
@@ -390,7 +437,7 @@ class SlidingPiece(Piece):
         cls, c: Color, piece_bb: Bitboard, bitboards: Bitboard, s_bb: Bitboard = UNIVERSE
     ) -> Bitboard:
         blockers = (bitboards.by_color(c) | bitboards.by_color(~c)) & ~(bitboards.king_bb(~c))
-        attack_set = Bitboard(0)
+        attack_set = EMPTY
         for _from in iter_bitscan_forward(piece_bb & s_bb):
             attack_set |= cls._attack_lookup(_from, blockers)
         return attack_set
@@ -400,7 +447,7 @@ class SlidingPiece(Piece):
         cls, c: Color, piece_bb: Bitboard, bitboards: Bitboard, s_bb: Bitboard = UNIVERSE, target: Bitboard = UNIVERSE
     ) -> Bitboard:
         blockers = bitboards.by_color(c) | bitboards.by_color(~c)
-        attack_set = Bitboard(0)
+        attack_set = EMPTY
         for _from in iter_bitscan_forward(piece_bb & s_bb):
             attack_set |= cls._attack_lookup(_from, blockers)
         return attack_set & bitboards.by_color(~c) & target
@@ -410,7 +457,7 @@ class SlidingPiece(Piece):
         cls, c: Color, piece_bb: Bitboard, bitboards: Bitboard, s_bb: Bitboard = UNIVERSE, target: Bitboard = UNIVERSE
     ) -> Bitboard:
         blockers = bitboards.by_color(c) | bitboards.by_color(~c)
-        attack_set = Bitboard(0)
+        attack_set = EMPTY
         for _from in iter_bitscan_forward(piece_bb & s_bb):
             attack_set |= cls._attack_lookup(_from, blockers)
         return attack_set & bitboards.by_color(c) & target
@@ -423,7 +470,7 @@ class SlidingPiece(Piece):
         bitboards: StackedBitboard,
         checks_bb: Bitboard,
         state: State,
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_occupancy = bitboards.by_color(~c)
         blockers = bitboards.by_color(c) | other_occupancy
 
@@ -433,7 +480,7 @@ class SlidingPiece(Piece):
             pin_mask = Piece.get_pin_mask(c, _from, bitboards)
             attack_set = cls._attack_lookup(_from, blockers) & other_occupancy & pin_mask & forced_attack_set
             for _to in iter_bitscan_forward(attack_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.CAPTURES)
+                yield CAPTURE_FLAG | (_from << FROM_SHIFT) | _to
 
     @classmethod
     def _quiet_moves(
@@ -443,7 +490,7 @@ class SlidingPiece(Piece):
         bitboards: StackedBitboard,
         checks_bb: Bitboard,
         state: State,
-    ) -> Generator[Move, None, None]:
+    ) -> Generator[int, None, None]:
         other_occupancy = bitboards.by_color(~c)
         blockers = bitboards.by_color(c) | other_occupancy
 
@@ -453,7 +500,7 @@ class SlidingPiece(Piece):
             pin_mask = Piece.get_pin_mask(c, _from, bitboards)
             attack_set = cls._attack_lookup(_from, blockers) & ~blockers & pin_mask & check_mask
             for _to in iter_bitscan_forward(attack_set):
-                yield Move(_from=_from, _to=_to, flags=MoveFlags.QUIET)
+                yield (_from << FROM_SHIFT) | _to
 
 
 class Bishop(SlidingPiece):
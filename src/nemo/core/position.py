@@ -1,4 +1,5 @@
-from collections import defaultdict
+from itertools import islice
+from typing import List, Tuple, Union
 import io
 
 from .constants import STARTING_FEN
@@ -7,10 +8,15 @@ from .pgn import PGNWriter
 from .piece import Piece
 from .types import (
     Bitboard,
+    BOARD_COUNT,
     Color,
+    EMPTY,
+    OCCUPANCY,
     PieceAndSquare,
     PieceType,
+    PositionSnapshot,
     INV_PIECE_TYPE_MAP,
+    MOVABLE,
     PIECE_REGISTRY,
     PROMOTABLE,
     UNBLOCKABLE_CHECKERS,
@@ -20,8 +26,11 @@ from .types import (
 )
 from .stacked_bitboard import StackedBitboard
 from .magic import Magic
-from .move import Move
+from .move import FLAGS_SHIFT, FROM_SHIFT, MOVES, PROMOTION_PIECE_TYPES, SQUARE_MASK, MoveFlags, MoveList
 from .move_gen import (
+    KNIGHT_ATTACKS,
+    PAWN_ATTACKS,
+    QUEEN_ATTACKS,
     e_one,
     w_one,
     relative_fourth_rank_bb,
@@ -32,44 +41,100 @@ from .move_gen import (
 from .utils import bitscan_forward, iter_bitscan_forward, popcnt
 from .zobrist import ZOBRIST_KEYS, ZOBRIST_CASTLE, ZOBRIST_EP, ZOBRIST_TURN
 
-def emptyboard():
-    return Bitboard(0)
-
-def boardmaker():
-    return defaultdict(emptyboard)
-
 class Position:
     def __init__(self, fen=STARTING_FEN):
         self.clear()
         if fen:
             self.from_fen(fen)
 
-        self.key = hash(
-            self.__boards
-        )  # only do this once; incremental update per move.
+        self.key = self.__boards.board_hash() ^ self.state_zk()  # only do this once; incremental update per move.
+        self.pawn_key = self.__boards.pawn_hash()
+
+    @classmethod
+    def from_moves(cls, root: Union[str, PositionSnapshot], moves: List[int]) -> "Position":
+        """Replays encoded ``moves`` on top of a root FEN or snapshot, reproducing the
+        incremental key."""
+        position = cls.from_snapshot(root) if isinstance(root, PositionSnapshot) else cls(fen=root)
+        for move in moves:
+            position.make_move(move)
+        return position
+
+    @classmethod
+    def from_snapshot(cls, snapshot: PositionSnapshot) -> "Position":
+        """Rebuilds the position in ``snapshot``; its history starts there."""
+        boards = list(snapshot.boards)
+        square_occupancy = [None] * 64
+        for c in Color:
+            for piece_type in MOVABLE:
+                for s in iter_bitscan_forward(boards[c * 8 + piece_type]):
+                    square_occupancy[s] = PIECE_REGISTRY[piece_type](c)
+
+        position = cls.__new__(cls)
+        position.clear()
+        position.__boards = StackedBitboard(boards, square_occupancy)
+        position.__state = State.from_values(
+            snapshot.turn,
+            snapshot.castling_rights,
+            snapshot.ep_square,
+            snapshot.half_move_clock,
+            snapshot.full_move_clock,
+        )
+        position.__root = snapshot
+        position.key = snapshot.key
+        position.pawn_key = snapshot.pawn_key
+        return position
+
+    def snapshot(self) -> PositionSnapshot:
+        """An immutable copy of the current position, for ``from_snapshot``."""
+        state = self.__state
+        return PositionSnapshot(
+            tuple(self.__boards.boards),
+            state.turn,
+            int(state.castling_rights),
+            state.ep_square,
+            state.half_move_clock,
+            state.full_move_clock,
+            self.key,
+            self.pawn_key,
+        )
+
+    def copy(self) -> "Position":
+        """A copy of the current position that moves independently of this one.
+
+        Only the board and the current state are copied, so the cost doesn't grow with the
+        game; the copy's history starts here.
+        """
+        position = self.__class__.__new__(self.__class__)
+        position.__boards = self.__boards.copy()
+        position.__state = self.__state.copy()
+        position.__root = self.snapshot()
+        position.key = self.key
+        position.pawn_key = self.pawn_key
+        return position
+
+    def apply(self, move: int) -> "Position":
+        """Copy-make: a new position after ``move``, leaving this one unchanged."""
+        position = self.copy()
+        position.make_move(move)
+        return position
 
     def clear(self):
         self.__boards = None
         self.__state = None
+        self.__root = None
 
     def from_fen(self, fen):
         split_fen = fen.split(" ")
         split_fen = split_fen + ["0", "1"] if len(split_fen) < 6 else split_fen
         ranks, turn, castling_rights, ep_square, hmc, fmc = split_fen
         rows = ranks.split("/")[::-1]
-        boards = defaultdict(boardmaker)
+        boards = [EMPTY] * BOARD_COUNT
         square_occupancy = [None] * 64
 
         if ep_square != "-":
             square = Squares[ep_square.upper()]
             c = Color.WHITE if square._value_ < 32 else Color.BLACK
-            piece_type = PIECE_REGISTRY["ep"]._type
-            boards[c][piece_type] |= square.bitboard
-            boards[~c][piece_type] = Bitboard(0)
-        else:
-            piece_type = PIECE_REGISTRY["ep"]._type
-            boards[Color.WHITE][piece_type] = Bitboard(0)
-            boards[Color.BLACK][piece_type] = Bitboard(0)
+            boards[c * 8 + PieceType.ENPASSANT] = square.bitboard
 
         for i, row in enumerate(rows):
             j = 0
@@ -78,9 +143,8 @@ class Position:
                     color = Color.WHITE if c.isupper() else Color.BLACK
                     piece = PIECE_REGISTRY[c.lower()](color)
                     idx = i * 8 + j
-                    bb = boards[color][piece._type] | (1 << idx)
                     square_occupancy[idx] = piece
-                    boards[color][piece._type] |= bb
+                    boards[color * 8 + piece._type] |= 1 << idx
                     j += 1
                 else:
                     j += int(c)
@@ -96,19 +160,35 @@ class Position:
         )
 
     @property
-    def legal_moves(self):
-        for test_piece in self.boards.iterpieces(self.state.turn):
-            yield from iter(test_piece.legal_moves(self.bitboards, self.state))
+    def legal_moves(self) -> MoveList:
+        return self.generate_legal_moves(MoveList())
 
     @property
-    def legal_captures(self):
-        for test_piece in self.boards.iterpieces(self.state.turn):
-            yield from iter(test_piece.legal_captures(self.bitboards, self.state))
+    def legal_captures(self) -> MoveList:
+        return self.generate_legal_captures(MoveList())
 
     @property
-    def legal_quiet(self):
+    def legal_quiet(self) -> MoveList:
+        return self.generate_legal_quiet(MoveList())
+
+    def generate_legal_moves(self, move_list: MoveList) -> MoveList:
+        """Clears ``move_list`` and fills it with the legal moves, e.g. to reuse a buffer per ply."""
+        move_list.clear()
         for test_piece in self.boards.iterpieces(self.state.turn):
-            yield from iter(test_piece.legal_quiet(self.bitboards, self.state))
+            test_piece.legal_moves(self.bitboards, self.state, move_list)
+        return move_list
+
+    def generate_legal_captures(self, move_list: MoveList) -> MoveList:
+        move_list.clear()
+        for test_piece in self.boards.iterpieces(self.state.turn):
+            test_piece.legal_captures(self.bitboards, self.state, move_list)
+        return move_list
+
+    def generate_legal_quiet(self, move_list: MoveList) -> MoveList:
+        move_list.clear()
+        for test_piece in self.boards.iterpieces(self.state.turn):
+            test_piece.legal_quiet(self.bitboards, self.state, move_list)
+        return move_list
 
     def king_legal_moves(self, c: Color):
         king = self.boards.get_king(c)
@@ -122,6 +202,13 @@ class Position:
     def is_legal(self):
         return not self.boards.king_in_check(~self.state.turn)
 
+    def is_legal_move(self, move: int) -> bool:
+        """Validates a move from outside the generator, e.g. a hash or killer move."""
+        piece = self.boards.piece_at((move >> FROM_SHIFT) & SQUARE_MASK)
+        if piece is None or piece.color != self.state.turn:
+            return False
+        return piece.is_legal(move, self.bitboards, self.state)
+
     def is_check(self):
         return self.boards.king_in_check(self.state.turn)
 
@@ -134,38 +221,82 @@ class Position:
     def other_in_double_check(self):
         return self.boards.king_in_double_check(~self.state.turn)
 
+    def gives_check(self, move: int) -> bool:
+        """Whether the quiet ``move`` checks the opponent, found without making it.
+
+        The moved piece may check from its new square, and a slider may check through a
+        square that was vacated; sliders are only looked up when a changed square is on a
+        line through the enemy king. Captures and promotions aren't handled.
+        """
+        _from, _to, flags = (move >> FROM_SHIFT) & SQUARE_MASK, move & SQUARE_MASK, move >> FLAGS_SHIFT
+        color = self.state.turn
+        boards, own = self.boards.boards, color * 8
+        piece_type = self.boards.piece_at(_from)._type
+        king_bb = boards[(~color) * 8 + PieceType.KING]
+        king_square = bitscan_forward(king_bb)
+        vacated, filled = 1 << _from, 1 << _to
+        queens = boards[own + PieceType.QUEEN]
+        rooks, bishops = boards[own + PieceType.ROOK] | queens, boards[own + PieceType.BISHOP] | queens
+        if piece_type == PieceType.PAWN:
+            if PAWN_ATTACKS[color](filled) & king_bb:
+                return True
+        elif piece_type == PieceType.KNIGHT:
+            if KNIGHT_ATTACKS[_to] & king_bb:
+                return True
+        elif piece_type == PieceType.KING:
+            if flags == MoveFlags.KINGSIDE_CASTLE or flags == MoveFlags.QUEENSIDE_CASTLE:
+                r_from, r_to = relative_rook_squares(color, short=flags == MoveFlags.KINGSIDE_CASTLE)
+                rooks ^= (1 << r_from) | (1 << r_to)
+                vacated |= 1 << r_from
+                filled |= 1 << r_to
+        else:
+            if piece_type != PieceType.BISHOP:
+                rooks ^= vacated | filled
+            if piece_type != PieceType.ROOK:
+                bishops ^= vacated | filled
+        if not (vacated | filled) & QUEEN_ATTACKS[king_square]:
+            return False
+        occupancy = ((boards[OCCUPANCY] | boards[8 + OCCUPANCY]) & ~vacated) | filled
+        return bool(
+            Magic.rook_attacks(king_square, occupancy) & rooks
+            or Magic.bishop_attacks(king_square, occupancy) & bishops
+        )
+
     def is_checkmate(self):
-        return self.is_check() and len(list(self.legal_moves)) == 0
+        return self.is_check() and len(self.legal_moves) == 0
 
     def is_stalemate(self):
-        no_legal_moves = (not self.is_check() and len(list(self.legal_moves)) == 0)
+        no_legal_moves = (not self.is_check() and len(self.legal_moves) == 0)
         #  need to check all the insufficient material cases as well.
         if no_legal_moves:
             return True
 
-    def make_move(self, move: Move, details=False, uci=False) -> PieceAndSquare:
+    def make_move(self, move: int, details=False, uci=False) -> PieceAndSquare:
         if uci:
             uci_map = {
-                m.uci: m for m in self.legal_moves
+                MOVES[m].uci: m for m in self.legal_moves
             }
-            move = uci_map[move.uci]
-        _from, _to = move
+            move = uci_map[MOVES[move].uci]
+        _from, _to, flags = (move >> FROM_SHIFT) & SQUARE_MASK, move & SQUARE_MASK, move >> FLAGS_SHIFT
         color = self.state.turn
         captured = None
         promotion_piece = None
         ep_square = None
         piece = self.boards.piece_at(_from)
-        fen = self.fen
+        ep_board = self.boards.ep_board(~color)
+        pins_and_checkers = self.boards.pins_and_checkers
+        changed_bb = (1 << _from) | (1 << _to)
         # assert piece is not None
-        if move.is_enpassant_capture:
+        if flags == MoveFlags.ENPASSANT_CAPTURE:
             self.boards.move_piece(_from, _to, piece)
             captured = self.boards.remove_piece(square_below(color, _to))
             self.boards.toggle_enpassant_board(~color)
-        elif move.is_double_pawn_push:
+            changed_bb |= 1 << square_below(color, _to)
+        elif flags == MoveFlags.DOUBLE_PAWN_PUSH:
             other_king_bb_on_fifth = self.boards.king_bb(
                 ~color
             ) & relative_fourth_rank_bb(color)
-            _to_bb = Square(_to).bitboard
+            _to_bb = 1 << _to
             adj_bb = e_one(_to_bb) | w_one(_to_bb)
             ep_square = square_below(color, _to)
             if not (
@@ -173,19 +304,21 @@ class Position:
             ):
                 self.boards.toggle_enpassant_board(color, ep_square)
             self.boards.move_piece(_from, _to, piece)
-        elif move.is_promotion:
-            promotion_piece = PIECE_REGISTRY[move.promotion_piece_type](color)
+        elif flags & MoveFlags.PROMOTION:
+            promotion_piece = PIECE_REGISTRY[PROMOTION_PIECE_TYPES[flags & 3]](color)
             self.boards.remove_piece(_from)
             captured = self.boards.place_piece(_to, promotion_piece)
-        elif move.is_capture:
+        elif flags & MoveFlags.CAPTURES:
             captured = self.boards.move_piece(_from, _to, piece)
-        elif move.is_castle_kingside or move.is_castle_queenside:
+        elif flags == MoveFlags.KINGSIDE_CASTLE or flags == MoveFlags.QUEENSIDE_CASTLE:
             king = piece
-            r_from, r_to = relative_rook_squares(color, short=move.is_castle_kingside)
+            r_from, r_to = relative_rook_squares(color, short=flags == MoveFlags.KINGSIDE_CASTLE)
             self.boards.move_piece(_from, _to, king)
             self.boards.move_piece(r_from, r_to, self.boards.piece_at(r_from))
+            changed_bb |= (1 << r_from) | (1 << r_to)
         else:
             self.boards.move_piece(_from, _to, piece)
+        self.boards.update_pins_and_checkers(color, changed_bb)
 
         castling_rights_mask = 0
         if piece._type == PieceType.KING:
@@ -199,81 +332,143 @@ class Position:
         pidx = getattr(piece, "zobrist_index", 12)
         cidx = getattr(captured, "zobrist_index", 12)
         ppidx = getattr(promotion_piece, "zobrist_index", pidx)
+        captured_square = square_below(color, _to) if flags == MoveFlags.ENPASSANT_CAPTURE else _to
+        key = self.key
         self.boards.toggle_enpassant_board(~color)
+        self.key ^= self.state_zk()
         self.state.push(
             castling=castling_rights_mask,
             captured=captured,
             ep_square=ep_square,
             move=move,
-            fen=fen
+            half_move_clock=(
+                0
+                if captured is not None or piece._type == PieceType.PAWN
+                else self.state.half_move_clock + 1
+            ),
+            key=key,
+            pawn_key=self.pawn_key,
+            ep_board=ep_board,
+            pins_and_checkers=pins_and_checkers,
         )
-        self.key ^= self.zk_xor(
-            _from, _to, pidx, cidx, ppidx, self.state.castling_rights, ep_square
+        self.key ^= self.zk_xor(_from, _to, pidx, cidx, ppidx, captured_square) ^ self.state_zk()
+        if flags == MoveFlags.KINGSIDE_CASTLE or flags == MoveFlags.QUEENSIDE_CASTLE:
+            ridx = pidx - PieceType.KING + PieceType.ROOK
+            self.key ^= ZOBRIST_KEYS[ridx][r_from] ^ ZOBRIST_KEYS[ridx][r_to]
+        self.pawn_key ^= self.pawn_zk_xor(
+            _from,
+            _to,
+            pidx if piece._type == PieceType.PAWN else 12,
+            cidx if captured is not None and captured._type == PieceType.PAWN else 12,
+            captured_square,
+            flags & MoveFlags.PROMOTION,
         )
 
         return PieceAndSquare(piece=piece, square=_from)
 
 
-    def unmake_move(self, _move: Move) -> None:
-        move = ~_move
-        _from, _to = move
-        castling, captured, ep_square, _, _ = self.state.pop()
-        # castling, _, _ = self.state.top()
+    def unmake_move(self, move: int) -> None:
+        # Played backwards, so ``_from`` is the square the piece moved to.
+        _from, _to, flags = move & SQUARE_MASK, (move >> FROM_SHIFT) & SQUARE_MASK, move >> FLAGS_SHIFT
+        record = self.state.pop()
+        captured, ep_board = record.captured, record.ep_board
         color = self.state.turn
         piece = self.boards.piece_at(_from)
 
-        pidx = getattr(piece, "zobrist_index", 12)
-        cidx = getattr(captured, "zobrist_index", 12)
-        ppidx = pidx  #  placeholder in-case of undoing promotion piece
-
-        if move.is_enpassant_capture:
+        if flags == MoveFlags.ENPASSANT_CAPTURE:
             self.boards.move_piece(_from, _to, piece)
-            self.boards.toggle_enpassant_board(~color, Square(_from))
+            self.boards.toggle_enpassant_board(~color, _from)
             self.boards.place_piece(square_below(color, _from), captured)
-        elif move.is_double_pawn_push:
+        elif flags == MoveFlags.DOUBLE_PAWN_PUSH:
             self.boards.move_piece(_from, _to, piece)
             self.boards.toggle_enpassant_board(color)
-        elif move.is_promotion:
+        elif flags & MoveFlags.PROMOTION:
             pawn = PIECE_REGISTRY["p"](color)
-            ppidx = getattr(pawn, "zobrist_index", 12)
             promoted = self.boards.remove_piece(_from)  # remove the promoted piece
             self.boards.place_piece(_to, pawn)
             if captured:
                 self.boards.place_piece(_from, captured)
-        elif move.is_capture:
+        elif flags & MoveFlags.CAPTURES:
             self.boards.move_piece(_from, _to, piece, drop=captured)
-        elif move.is_castle_kingside or move.is_castle_queenside:
+        elif flags == MoveFlags.KINGSIDE_CASTLE or flags == MoveFlags.QUEENSIDE_CASTLE:
             king = piece
-            r_to, r_from = relative_rook_squares(color, short=move.is_castle_kingside)
+            r_to, r_from = relative_rook_squares(color, short=flags == MoveFlags.KINGSIDE_CASTLE)
             self.boards.move_piece(_from, _to, king)
             self.boards.move_piece(r_from, r_to, self.boards.piece_at(r_from))
         else:
             self.boards.move_piece(_from, _to, piece)
 
-        self.key ^= self.undo_zk_xor(_from, _to, pidx, cidx, ppidx, castling, ep_square)
+        if ep_board:  # the opponent's double push could still be captured en-passant
+            self.boards.toggle_enpassant_board(~color, bitscan_forward(ep_board))
+        self.boards.restore_pins_and_checkers(record.pins_and_checkers)
+        self.key = record.key
+        self.pawn_key = record.pawn_key
+
+    def make_null_move(self) -> None:
+        """Passes the turn without moving, for null-move pruning.
+
+        Only the turn and the en-passant board change, so the pin and check sets stay valid.
+        The side to move must not be in check.
+        """
+        color = self.state.turn
+        ep_board = self.boards.ep_board(~color)
+        self.boards.toggle_enpassant_board(~color)
+        key = self.key
+        self.key ^= self.state_zk()
+        self.state.push(
+            castling=0,
+            half_move_clock=self.state.half_move_clock + 1,
+            key=key,
+            pawn_key=self.pawn_key,
+            ep_board=ep_board,
+        )
+        self.key ^= self.state_zk()
+
+    def unmake_null_move(self) -> None:
+        record = self.state.pop()
+        if record.ep_board:
+            self.boards.toggle_enpassant_board(~self.state.turn, bitscan_forward(record.ep_board))
+        self.key = record.key
 
     @staticmethod
-    def zk_xor(_from, _to, pidx, cidx, ppidx, castling, ep_square, debug=True):
+    def zk_xor(_from, _to, pidx, cidx, ppidx, captured_square):
+        """Key update for the moving and captured pieces; the rook of a castle is keyed apart."""
+        return ZOBRIST_KEYS[pidx][_from] ^ ZOBRIST_KEYS[cidx][captured_square] ^ ZOBRIST_KEYS[ppidx][_to]
+
+    def state_zk(self) -> int:
+        """Zobrist terms of the side to move, the castling rights and the en-passant file."""
+        state = self.state
+        ep_square = state.ep_square
         return (
-            ZOBRIST_KEYS[pidx][_from]
-            ^ ZOBRIST_KEYS[cidx][_to]
-            ^ ZOBRIST_KEYS[ppidx][_to]
-            ^ ZOBRIST_CASTLE[castling]
+            ZOBRIST_CASTLE[state.castling_rights]
             ^ (0 if ep_square is None else ZOBRIST_EP[ep_square % 8])
-            ^ ZOBRIST_TURN
+            ^ (ZOBRIST_TURN if state.turn else 0)
         )
 
     @staticmethod
-    def undo_zk_xor(_from, _to, pidx, cidx, ppidx, castling, ep_square, debug=True):
+    def pawn_zk_xor(_from, _to, pidx, cidx, captured_square, promotion):
+        """Pawn key update for a move; ``pidx``/``cidx`` are 12 unless a pawn moved/was captured."""
         return (
             ZOBRIST_KEYS[pidx][_from]
-            ^ ZOBRIST_KEYS[cidx][_from]
-            ^ ZOBRIST_KEYS[ppidx][_to]
-            ^ ZOBRIST_CASTLE[castling]
-            ^ (0 if ep_square is None else ZOBRIST_EP[ep_square % 8])
-            ^ ZOBRIST_TURN
+            ^ (0 if promotion else ZOBRIST_KEYS[pidx][_to])
+            ^ ZOBRIST_KEYS[cidx][captured_square]
         )
 
+    @property
+    def history(self) -> Tuple[Union[str, PositionSnapshot], List[int]]:
+        """The root and encoded moves played since, for ``Position.from_moves``.
+
+        The root is a snapshot for a copy, whose FEN is only built on demand.
+        """
+        return self.__root or self.state.fen, [int(record.move) for record in islice(self.state, 1, None)]
+
+    @property
+    def root_fen(self) -> str:
+        """FEN of the position the history starts from."""
+        if self.state.fen is None:  # a copy, built on demand from its root snapshot
+            self.state.fen = self.from_snapshot(self.__root).fen
+        return self.state.fen
+
     @property
     def state(self):
         return self.__state
@@ -319,7 +514,8 @@ class Position:
             s.write(f" {self.state.fen_suffix}")
             return s.getvalue()
 
-    def san(self, move: Move) -> str:
+    def san(self, move: int) -> str:
+        move = MOVES[move]
         position_suffix = ""
         if self.is_check():
             position_suffix = "+"
@@ -376,22 +572,22 @@ def test_pawns():
     black_pawn = PIECE_REGISTRY["p"](Color.BLACK)
 
     p = Position()
-    assert white_pawn.captures(p.bitboards) == []
+    assert len(white_pawn.captures(p.bitboards)) == 0
     assert len(white_pawn.quiet_moves(p.bitboards)) == 16
 
     p = Position(
         fen="rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
     )  # pawn attacks
     assert len(white_pawn.captures(p.bitboards)) == 1
-    assert str(white_pawn.captures(p.bitboards)[0]) == "e4d5"
+    assert str(MOVES[white_pawn.captures(p.bitboards)[0]]) == "e4d5"
     assert len(black_pawn.captures(p.bitboards)) == 1
-    assert str(black_pawn.captures(p.bitboards)[0]) == "d5e4"
+    assert str(MOVES[black_pawn.captures(p.bitboards)[0]]) == "d5e4"
 
     p = Position(
         fen="rnbqkbnr/1pp1pppp/p7/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"
     )  # enpassant
     assert len(white_pawn.captures(p.bitboards)) == 1
-    assert str(white_pawn.captures(p.bitboards)[0]) == "e5d6"
+    assert str(MOVES[white_pawn.captures(p.bitboards)[0]]) == "e5d6"
     assert len(black_pawn.captures(p.bitboards)) == 0
 
     p = Position(
@@ -399,8 +595,8 @@ def test_pawns():
     )  # captures + promotions
     assert len(white_pawn.captures(p.bitboards)) == 8
     assert len(black_pawn.captures(p.bitboards)) == 8
-    assert white_pawn.captures(p.bitboards)[0].is_promotion
-    assert black_pawn.captures(p.bitboards)[0].is_promotion
+    assert MOVES[white_pawn.captures(p.bitboards)[0]].is_promotion
+    assert MOVES[black_pawn.captures(p.bitboards)[0]].is_promotion
 
 
 def test_king():
@@ -408,7 +604,21 @@ def test_king():
 
 
 def test_pins():
-    pass
+    # imported here, perft and the suite import this module
+    from .perft import perft
+    from .perft_suite import PERFT_SUITE
+
+    names = ("kiwipete", "position3", "illegal_ep_1", "illegal_ep_2", "discovered_check")
+    for position in PERFT_SUITE:
+        if position.name not in names:
+            continue
+        # the incremental pins and checkers are compared with a full recomputation at every
+        # node, which is slow, so only the counts up to a few thousand nodes are walked
+        for depth, count in position.counts.items():
+            if count > 10000:
+                break
+            n = perft(depth, fen=position.fen, verify=True)
+            assert n.nodes == count, f"{position.name} depth {depth}: {n.nodes} != {count}"
 
 
 def test_promotions():
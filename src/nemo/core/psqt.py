@@ -0,0 +1,251 @@
+"""Piece values and midgame/endgame piece-square tables, shared by the evaluation and the
+incremental scores kept in ``StackedBitboard``."""
+from .types import Color, PieceType
+from .utils import flatten
+
+PIECE_VALUES = {
+    PieceType.NULL: 0,
+    PieceType.ENPASSANT: 0,
+    PieceType.PAWN: 100,
+    PieceType.KNIGHT: 280,
+    PieceType.BISHOP: 330,
+    PieceType.ROOK: 490,
+    PieceType.QUEEN: 900,
+    PieceType.KING: 20000,
+}
+
+W_PAWNS_TABLE = flatten(
+    [
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5,  5, 15, 35, 35, 15,  5,  5],
+        [0,  0,  0, 25, 25,  0,  0,  0],
+        [5, -5,-10,  0,  0,-10, -5,  5],
+        [5, 10, 10,-20,-20, 10, 10,  5],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+    ][::-1]
+)
+
+B_PAWNS_TABLE = flatten(
+    [
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [0,  0,  0, 25, 25,  0,  0,  0],
+        [5,  5, 15, 27, 27, 15,  5,  5],
+        [5, -5,-10,  0,  0,-10, -5,  5],
+        [5, 10, 10,-20,-20, 10, 10,  5],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+    ]
+)
+
+KNIGHTS_TABLE = flatten(
+    [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20,   0,   0,   0,   0, -20, -40],
+        [-30,   0,  10,  15,  15,  10,   0, -30],
+        [-30,   5,  15,  20,  20,  15,   5, -30],
+        [-30,   0,  15,  20,  20,  15,   0, -30],
+        [-30,   5,  10,  15,  15,  10,   5, -30],
+        [-40, -20,   0,   5,   5,   0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+    ]
+)
+
+W_BISHOPS_TABLE = flatten(
+    [
+        [-20,-10,-10,-10,-10,-10,-10,-20],
+        [-10,  0,  0,  0,  0,  0,  0,-10],
+        [-10,  0,  5, 10, 10,  5,  0,-10],
+        [-10,  5,  5, 10, 10,  5,  5,-10],
+        [-10,  0, 10, 10, 10, 10,  0,-10],
+        [-10, 10, 10, 10, 10, 10, 10,-10],
+        [-10,  5,  0,  0,  0,  0,  5,-10],
+        [-20,-10,-10,-10,-10,-10,-10,-20],
+    ][::-1]
+)
+
+B_BISHOPS_TABLE = flatten(
+    [
+        [-20,-10,-10,-10,-10,-10,-10,-20],
+        [-10,  0,  0,  0,  0,  0,  0,-10],
+        [-10,  0,  5, 10, 10,  5,  0,-10],
+        [-10,  5,  5, 10, 10,  5,  5,-10],
+        [-10,  0, 10, 10, 10, 10,  0,-10],
+        [-10, 10, 10, 10, 10, 10, 10,-10],
+        [-10,  5,  0,  0,  0,  0,  5,-10],
+        [-20,-10,-10,-10,-10,-10,-10,-20],
+    ]
+)
+
+W_ROOKS_TABLE = flatten(
+    [
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [15, 20, 20, 20, 20, 20, 20, 15],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  5,  5,  0,  0,  0],
+    ][::-1]
+)
+
+B_ROOKS_TABLE = flatten(
+    [
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [15, 20, 20, 20, 20, 20, 20, 15],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [0,  0,  0,  5,  5,  0,  0,  0],
+    ]
+)
+
+W_QUEENS_TABLE = flatten(
+    [
+        [-20,-10,-10 , -5, -5,-10,-10,-20],
+        [-10 ,  0,  0,  0,  0,  0,  0,-10],
+        [-10 ,  0,  5,  5,  5,  5,  0,-10],
+        [-5 ,  0,  5,  5,  5,  5,  0, -5],
+        [0,  0,  5,  5,  5,  5,  0, -5],
+        [-10 ,  5,  5,  5,  5,  5,  0,-10],
+        [-10 ,  0,  5,  0,  0,  0,  0,-10],
+        [-20,-10,-10 , -5, -5,-10,-10,-20],
+    ][::-1]
+)
+
+B_QUEENS_TABLE = flatten(
+    [
+        [-20,-10,-10 , -5, -5,-10,-10,-20],
+        [-10 ,  0,  0,  0,  0,  0,  0,-10],
+        [-10 ,  0,  5,  5,  5,  5,  0,-10],
+        [-5 ,  0,  5,  5,  5,  5,  0, -5],
+        [0,  0,  5,  5,  5,  5,  0, -5],
+        [-10 ,  5,  5,  5,  5,  5,  0,-10],
+        [-10 ,  0,  5,  0,  0,  0,  0,-10],
+        [-20,-10,-10 , -5, -5,-10,-10,-20],
+    ]
+)
+
+W_KINGS_TABLE = flatten(
+    [
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-20,-30,-30,-40,-40,-30,-30,-20],
+        [-10,-20,-20,-20,-20,-20,-20,-10],
+        [20, 20,  0,  0,  0,  0, 20, 20],
+        [25, 40, 10,  0,  0, 10, 40, 25],
+    ][::-1]
+)
+
+B_KINGS_TABLE = flatten(
+    [
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-30,-40,-40,-50,-50,-40,-40,-30],
+        [-20,-30,-30,-40,-40,-30,-30,-20],
+        [-10,-20,-20,-20,-20,-20,-20,-10],
+        [20, 20,  0,  0,  0,  0, 20, 20],
+        [25, 40, 10,  0,  0, 10, 40, 25],
+    ]
+)
+
+
+PIECE_SQUARE_TABLES = {
+    Color.WHITE: {
+        PieceType.PAWN: W_PAWNS_TABLE,
+        PieceType.KING: W_KINGS_TABLE,
+        PieceType.KNIGHT: KNIGHTS_TABLE,
+        PieceType.ROOK: W_ROOKS_TABLE,
+        PieceType.BISHOP: W_BISHOPS_TABLE,
+        PieceType.QUEEN: W_QUEENS_TABLE,
+    },
+    Color.BLACK: {
+        PieceType.PAWN: B_PAWNS_TABLE,
+        PieceType.KING: B_KINGS_TABLE,
+        PieceType.KNIGHT: KNIGHTS_TABLE,
+        PieceType.ROOK: B_ROOKS_TABLE,
+        PieceType.BISHOP: B_BISHOPS_TABLE,
+        PieceType.QUEEN: B_QUEENS_TABLE,
+    },
+}
+
+W_PAWNS_ENDGAME_TABLE = flatten(
+    [
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [80, 80, 80, 80, 80, 80, 80, 80],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [30, 30, 30, 30, 30, 30, 30, 30],
+        [20, 20, 20, 20, 20, 20, 20, 20],
+        [10, 10, 10, 10, 10, 10, 10, 10],
+        [10, 10, 10, 10, 10, 10, 10, 10],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+    ][::-1]
+)
+
+B_PAWNS_ENDGAME_TABLE = flatten(
+    [
+        [0,  0,  0,  0,  0,  0,  0,  0],
+        [80, 80, 80, 80, 80, 80, 80, 80],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [30, 30, 30, 30, 30, 30, 30, 30],
+        [20, 20, 20, 20, 20, 20, 20, 20],
+        [10, 10, 10, 10, 10, 10, 10, 10],
+        [10, 10, 10, 10, 10, 10, 10, 10],
+        [0,  0,  0,  0,  0,  0,  0,  0],
+    ]
+)
+
+W_KINGS_ENDGAME_TABLE = flatten(
+    [
+        [-50,-40,-30,-20,-20,-30,-40,-50],
+        [-30,-20,-10,  0,  0,-10,-20,-30],
+        [-30,-10, 20, 30, 30, 20,-10,-30],
+        [-30,-10, 30, 40, 40, 30,-10,-30],
+        [-30,-10, 30, 40, 40, 30,-10,-30],
+        [-30,-10, 20, 30, 30, 20,-10,-30],
+        [-30,-30,  0,  0,  0,  0,-30,-30],
+        [-50,-30,-30,-30,-30,-30,-30,-50],
+    ][::-1]
+)
+
+B_KINGS_ENDGAME_TABLE = flatten(
+    [
+        [-50,-40,-30,-20,-20,-30,-40,-50],
+        [-30,-20,-10,  0,  0,-10,-20,-30],
+        [-30,-10, 20, 30, 30, 20,-10,-30],
+        [-30,-10, 30, 40, 40, 30,-10,-30],
+        [-30,-10, 30, 40, 40, 30,-10,-30],
+        [-30,-10, 20, 30, 30, 20,-10,-30],
+        [-30,-30,  0,  0,  0,  0,-30,-30],
+        [-50,-30,-30,-30,-30,-30,-30,-50],
+    ]
+)
+
+ENDGAME_PIECE_SQUARE_TABLES = {
+    Color.WHITE: {
+        **PIECE_SQUARE_TABLES[Color.WHITE],
+        PieceType.PAWN: W_PAWNS_ENDGAME_TABLE,
+        PieceType.KING: W_KINGS_ENDGAME_TABLE,
+    },
+    Color.BLACK: {
+        **PIECE_SQUARE_TABLES[Color.BLACK],
+        PieceType.PAWN: B_PAWNS_ENDGAME_TABLE,
+        PieceType.KING: B_KINGS_ENDGAME_TABLE,
+    },
+}
+
+# Non-pawn material of the starting position; the game phase runs from it down to 0.
+PHASE_MATERIAL = 2 * (
+    2 * PIECE_VALUES[PieceType.KNIGHT]
+    + 2 * PIECE_VALUES[PieceType.BISHOP]
+    + 2 * PIECE_VALUES[PieceType.ROOK]
+    + PIECE_VALUES[PieceType.QUEEN]
+)
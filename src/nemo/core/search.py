@@ -1,25 +1,57 @@
 import asyncio
 
 from collections import deque, defaultdict
+from dataclasses import dataclass
 from functools import partial
 from json import dumps
-from typing import Iterable, Tuple, NamedTuple
+from typing import Iterable, Iterator, List, Tuple, NamedTuple
 from time import time, sleep
 
-from .constants import INFINITY, QUIESCENCE_SEARCH_DEPTH_PLY
-from .evaluation import evaluate, see, MATE_LOWER, MATE_UPPER, COLOR_MULT
-from .move import Move
+from .constants import INFINITY, MAX_PLY, QUIESCENCE_SEARCH_DEPTH_PLY
+from .evaluation import evaluate, see, MATE_LOWER, MATE_UPPER, COLOR_MULT, PIECE_VALUES
+from .move import CAPTURE_FLAG, FROM_SHIFT, MOVES, PROMOTION_FLAG, SQUARE_MASK, MoveList
 from .position import Position
-from .transposition import TTable, Killers
-from .types import Color, SearchResult, Square, NodeType
+from .transposition import TTable, Killers, History, CounterMoves, EvalCache
+from .types import Color, PieceType, SearchResult, Square, NodeType
 
 
 MODULUS = 500
+PROMOTION_BONUS = 1 << 24
+COUNTER_MOVE_BONUS = 1 << 16
+ASPIRATION_MAX_WINDOW = 1000
+
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_LATE_MOVES = 8
+FUTILITY_MAX_DEPTH = 2
+FUTILITY_MARGIN = 200
+
+# Plies a search can reach: the main search plus the quiescence search beyond it.
+MAX_SEARCH_PLY = MAX_PLY + QUIESCENCE_SEARCH_DEPTH_PLY + 1
+
+
+@dataclass
+class SearchOptions:
+    """Toggles for search features, so their effect on tree size can be measured."""
+
+    pvs: bool = True
+    # Off by default: evaluation swings between iterations are usually wider than the
+    # window, and the re-searches cost more than the narrower window saves.
+    aspiration: bool = False
+    aspiration_window: int = 100
+    null_move: bool = True
+    lmr: bool = True
+    futility: bool = True
+
 
 class SearchStats:
     def __init__(self):
         self.__stats = defaultdict(lambda: defaultdict(int))
         self.__nodes = 0
+        self.__eval_hits = 0
+        self.__eval_misses = 0
         self.__start = 0
         self.__rolling_nps = 0
         self.__window = deque(maxlen=10)
@@ -30,6 +62,9 @@ class SearchStats:
 
     def reset(self):
         self.__stats.clear()
+        self.__nodes = 0
+        self.__eval_hits = 0
+        self.__eval_misses = 0
         self.__start = time()
         self.__last = self.__start
         self.__rolling_nps = 0
@@ -40,7 +75,19 @@ class SearchStats:
 
     @property
     def info(self):
-        return {"nps": self.nps, "nodes": self.__nodes, **{k: dict(v) for k, v in self.__stats.items()}}
+        return {
+            "nps": self.nps,
+            "nodes": self.__nodes,
+            "eval_hits": self.__eval_hits,
+            "eval_misses": self.__eval_misses,
+            **{k: dict(v) for k, v in self.__stats.items()},
+        }
+
+    def increment_eval(self, hit: bool) -> None:
+        if hit:
+            self.__eval_hits += 1
+        else:
+            self.__eval_misses += 1
 
     def increment_nodes(self):
         self.__nodes += 1
@@ -61,7 +108,7 @@ class SearchStats:
 
 def probe_ttable(key: int, depth: int = 0) -> SearchResult:
     result = TTable.get(key)
-    if result is not None and result.ply > depth:
+    if result is not None and result.ply >= depth:
         return result
     return None
 
@@ -71,7 +118,7 @@ def store_ttable(key: int, result: SearchResult, force: bool = False) -> None:
         TTable[key] = result
 
 
-def update_killers(move: Move, score: float, ply: int) -> None:
+def update_killers(move: int, score: float, ply: int) -> None:
     key = hash(move)
     d = Killers[ply]
     if not d.is_full():
@@ -83,26 +130,112 @@ def update_killers(move: Move, score: float, ply: int) -> None:
             d[key] = (move, score)
 
 
-def get_ordered_moves(node: Position, ply: int, only_captures: bool = False) -> Iterable[Move]:
-    def sort_key(move: Move) -> Tuple[int, int, int]:
-        see_result = 0
-        see_result = see(node, move) if move.is_capture else 0
-        flag = move._flags if move._flags >= 4 else 0
-        return (int(hash(move) in Killers[ply]), see_result, flag)
-    movegen = node.legal_captures if only_captures else node.legal_moves
-    moves = deque(sorted(movegen, key=lambda m: sort_key(m), reverse=True))
+def mvv_lva(node: Position, move: int) -> int:
+    """Most-valuable-victim / least-valuable-attacker score of a capture."""
+    victim = node.boards.piece_at(move & SQUARE_MASK)
+    victim_type = victim._type if victim is not None else PieceType.PAWN  # en-passant
+    return PIECE_VALUES[victim_type] * 8 - node.boards.piece_at((move >> FROM_SHIFT) & SQUARE_MASK)._type
+
+
+def is_losing_capture(node: Position, move: int) -> bool:
+    attacker_type = node.boards.piece_at((move >> FROM_SHIFT) & SQUARE_MASK)._type
+    victim = node.boards.piece_at(move & SQUARE_MASK)
+    if attacker_type == PieceType.KING or victim is None:
+        return False
+    if PIECE_VALUES[attacker_type] <= PIECE_VALUES[victim._type]:
+        return False
+    return see(node, move) < 0
+
+
+def has_non_pawn_material(node: Position) -> bool:
+    """Whether the side to move has a piece other than pawns and the king, see null-move pruning."""
+    c = node.state.turn
+    boards = node.boards
+    return bool(boards.by_color(c) ^ boards.boards[c * 8 + PieceType.PAWN] ^ boards.king_bb(c))
+
+
+def quiet_score(node: Position, move: int, counter_move: int = None) -> int:
+    if move & PROMOTION_FLAG:
+        return PROMOTION_BONUS
+    score = History.score(node.state.turn, move)
+    if move == counter_move:
+        score += COUNTER_MOVE_BONUS
+    return score
+
+
+def new_move_lists() -> Tuple[MoveList, MoveList, MoveList]:
+    """The capture, quiet and losing-capture buffers ``get_ordered_moves`` fills for one ply."""
+    return MoveList(), MoveList(), MoveList()
+
+
+def get_ordered_moves(
+    node: Position,
+    ply: int,
+    only_captures: bool = False,
+    move_lists: Tuple[MoveList, MoveList, MoveList] = None,
+) -> Iterator[int]:
+    """Staged move picker.
+
+    Yields the hash move, winning captures by MVV-LVA, killers, quiet moves and finally
+    losing captures. Each stage is generated only once the previous one is exhausted, so a
+    cutoff on an early move skips the rest of move generation, and each stage is picked
+    best-first from its buffer in ``move_lists`` so the moves after a cutoff are never sorted.
+    """
+    captures, quiets, bad_captures = move_lists or new_move_lists()
     result = probe_ttable(node.key)
-    if result is not None and result.move:
-        moves.appendleft(result.move)
-    return moves
+    tt_move = result.move if result is not None else None
+    if tt_move is not None and (
+        (tt_move & CAPTURE_FLAG or not only_captures) and node.is_legal_move(tt_move)
+    ):
+        yield tt_move
+        searched = {tt_move}
+    else:
+        searched = set()
+
+    node.generate_legal_captures(captures)
+    captures.score(lambda m: mvv_lva(node, m))
+    bad_captures.clear()
+    for move in captures.iterbest():
+        if move in searched:
+            continue
+        if is_losing_capture(node, move):
+            bad_captures.append(move)
+        else:
+            yield move
+
+    if not only_captures:
+        for move, _ in list(Killers[ply].values()):
+            if move in searched or move & CAPTURE_FLAG or not node.is_legal_move(move):
+                continue
+            searched.add(move)
+            yield move
+
+        counter_move = CounterMoves.get(~node.state.turn, node.state.top().move)
+        node.generate_legal_quiet(quiets)
+        quiets.score(lambda m: quiet_score(node, m, counter_move))
+        for move in quiets.iterbest():
+            if move not in searched:
+                yield move
+
+    yield from bad_captures
 
 
 class Searcher:
-    def __init__(self, event: "threading.Event" = None):
+    def __init__(
+        self,
+        event: "threading.Event" = None,
+        worker_id: int = 0,
+        options: SearchOptions = None,
+        verbose: bool = True,
+    ):
         self.__event = event
+        self.__worker_id = worker_id
+        self.__verbose = verbose  # print each completed iteration
+        self.__options = options or SearchOptions()
         self.__stats = SearchStats()
         self.__make_move_partial = None
         self.__unmake_move_partial = None
+        self.__move_lists = [new_move_lists() for _ in range(MAX_SEARCH_PLY)]
 
     @property
     def stopped(self):
@@ -112,6 +245,14 @@ class Searcher:
     def stats(self):
         return self.__stats.info
 
+    @property
+    def worker_id(self) -> int:
+        return self.__worker_id
+
+    @property
+    def options(self) -> SearchOptions:
+        return self.__options
+
     def update_stats(self, result: SearchResult) -> None:
         self.__stats.update(result)
 
@@ -120,31 +261,77 @@ class Searcher:
 
     def search(self, p: Position, depth: int = 1):
         self.reset_stats()
+        if not self.__worker_id:
+            TTable.new_search()
         self.__make_move_partial = partial(p.make_move)
         self.__unmake_move_partial = partial(p.unmake_move)
         self.__us = p.state.turn
         self.__root_key = p.key
 
-        d = 1
-        alpha, beta = -INFINITY, INFINITY
-        while d <= depth:
-            result = self.negamax(p, d, alpha, beta)
-            if result:
+        # Lazy SMP helpers with odd ids skip the first iteration and search one ply deeper,
+        # so they are usually working a different depth from the main thread. Nobody searches
+        # past MAX_PLY, which the per-ply buffers and tables are sized for.
+        d = 1 + (self.__worker_id & 1)
+        depth = min(depth + (self.__worker_id & 1), MAX_PLY)
+        previous = None
+        while d <= depth and not self.stopped:
+            History.age()
+            result = self.aspiration_search(p, d, previous)
+            if result and not self.stopped:
                 store_ttable(p.key, result, force=True)
-                print(p.key, result)
+                previous = result.score
+                if self.__verbose and not self.__worker_id:
+                    print(p.key, result)
             d += 1
-        return TTable[p.key]
+        return TTable.get(p.key)
+
+    def aspiration_search(self, p: Position, depth: int, previous: float = None) -> SearchResult:
+        """Searches the root in a window around the previous iteration's score.
+
+        On a fail-low or fail-high the window is reopened around the returned score on the
+        failing side, doubling its width each time, until the score falls inside it; past
+        ``ASPIRATION_MAX_WINDOW`` the full window is used.
+        """
+        if not self.__options.aspiration or previous is None or abs(previous) >= MATE_LOWER:
+            return self.negamax(p, depth, -INFINITY, INFINITY)
+
+        delta = self.__options.aspiration_window
+        alpha, beta = previous - delta, previous + delta
+        while True:
+            result = self.negamax(p, depth, alpha, beta)
+            if self.stopped or alpha < result.score < beta or (-alpha == beta == INFINITY):
+                return result
+            delta *= 2
+            if delta > ASPIRATION_MAX_WINDOW:
+                alpha, beta = -INFINITY, INFINITY
+            elif result.score <= alpha:
+                alpha = result.score - delta
+            else:
+                beta = result.score + delta
+
+    def update_quiet_stats(
+        self, node: Position, move: int, depth: int, ply: int, score: float, quiets_tried: List[int]
+    ) -> None:
+        """Rewards a quiet move that caused a beta cutoff."""
+        c = node.state.turn
+        update_killers(move, score, ply)
+        History.update(c, move, depth, quiets_tried)
+        CounterMoves.update(~c, node.state.top().move, move)
 
     def evaluate(self, node: Position) -> float:
         # self.__stats.increment_nodes()
-        v = evaluate(node)
+        v = EvalCache.get(node.key)
+        self.__stats.increment_eval(v is not None)
+        if v is None:
+            v = evaluate(node)
+            EvalCache[node.key] = v
         return v
 
-    def make_move(self, move: Move) -> None:
+    def make_move(self, move: int) -> None:
         self.__stats.increment_nodes()
         self.__make_move_partial(move)
 
-    def unmake_move(self, move: Move) -> None:
+    def unmake_move(self, move: int) -> None:
         self.__unmake_move_partial(move)
 
     def quiesce(
@@ -156,7 +343,7 @@ class Searcher:
         ply: int = 0,
     ) -> float:
         if self.stopped:
-            return probe_ttable(node.key) or SearchResult()
+            return alpha
 
         static_eval = self.evaluate(node)
         if not depth:
@@ -167,14 +354,13 @@ class Searcher:
         elif static_eval > alpha:
             alpha = static_eval
 
-        captures = get_ordered_moves(node, ply, only_captures=True)
+        captures = get_ordered_moves(node, ply, only_captures=True, move_lists=self.__move_lists[ply])
         score = static_eval
         for move in captures:
             self.make_move(move)
             score = max(score, -self.quiesce(node, depth - 1, -beta, -alpha, ply + 1))
             self.unmake_move(move)
             if score >= beta:
-                update_killers(move, score, ply)
                 return beta
             if score > alpha:
                 alpha = score
@@ -205,8 +391,9 @@ class Searcher:
             if alpha >= beta:
                 return hash_move
 
-        if not depth:
-            if len(list(node.legal_captures)):
+        if depth <= 0:
+            # the capture buffer of this ply is refilled by quiesce, so it can be borrowed here
+            if len(node.generate_legal_captures(self.__move_lists[ply][0])):
                 return SearchResult(
                     depth,
                     self.quiesce(node, QUIESCENCE_SEARCH_DEPTH_PLY, alpha, beta, ply),
@@ -216,23 +403,105 @@ class Searcher:
                 )
             return SearchResult(depth, self.evaluate(node), None, alpha, beta)
 
-
-        moves = get_ordered_moves(node, ply)
+        options = self.__options
+        in_check = node.is_check()
+        pv_node = beta - alpha > 1
+        static_eval = None
+        if not in_check and (
+            (options.futility and depth <= FUTILITY_MAX_DEPTH)
+            or (options.null_move and not pv_node and depth >= NULL_MOVE_MIN_DEPTH)
+        ):
+            static_eval = self.evaluate(node)
+
+        if static_eval is not None and not pv_node and abs(beta) < MATE_LOWER:
+            # Reverse futility: the side to move is so far ahead that no move will fall below beta.
+            if (
+                options.futility
+                and depth <= FUTILITY_MAX_DEPTH
+                and static_eval - FUTILITY_MARGIN * depth >= beta
+            ):
+                return SearchResult(depth, static_eval, None, alpha, beta)
+
+            # Null move: if passing still fails high, a real move almost certainly would too.
+            # Skipped after another null move and without pieces, where zugzwang is likely.
+            if (
+                options.null_move
+                and ply
+                and depth >= NULL_MOVE_MIN_DEPTH
+                and static_eval >= beta
+                and node.state.top().move is not None
+                and has_non_pawn_material(node)
+            ):
+                node.make_null_move()
+                value = -self.negamax(
+                    node, depth - 1 - NULL_MOVE_REDUCTION, -beta, -beta + 1, ply + 1
+                ).score
+                node.unmake_null_move()
+                if self.stopped:
+                    return SearchResult()
+                if value >= beta:
+                    return SearchResult(depth, beta, None, alpha, beta)
+
+        # Forward futility: near the leaves, quiet moves can't lift a hopeless score above alpha.
+        futile = (
+            options.futility
+            and static_eval is not None
+            and depth <= FUTILITY_MAX_DEPTH
+            and abs(alpha) < MATE_LOWER
+            and static_eval + FUTILITY_MARGIN * depth <= alpha
+        )
+
+        moves = get_ordered_moves(node, ply, move_lists=self.__move_lists[ply])
         score = -INFINITY
         best = None
-        for move in moves:
+        quiets_tried = []
+        pvs = options.pvs
+        for i, move in enumerate(moves):
+            quiet = not (move & (CAPTURE_FLAG | PROMOTION_FLAG))
+            if futile and i and quiet and not node.gives_check(move):
+                continue
             self.make_move(move)
-            if node.is_legal:
-                score = max(score, -self.negamax(node, depth - 1, -beta, -alpha, ply + 1).score)
+            gives_check = node.is_check()
+
+            if not i:
+                value = -self.negamax(node, depth - 1, -beta, -alpha, ply + 1).score
+            else:
+                # Late quiet moves are searched to a reduced depth first, and again to the
+                # full depth only if they beat alpha.
+                reduction = 0
+                if (
+                    options.lmr
+                    and quiet
+                    and i >= LMR_MIN_MOVES
+                    and depth >= LMR_MIN_DEPTH
+                    and not (in_check or gives_check)
+                ):
+                    reduction = min(1 + (i >= LMR_LATE_MOVES), depth - 2)
+
+                # With PVS, prove the move is no better than the best so far with a zero
+                # window, re-searching with the full window only if it isn't.
+                a = -alpha - 1 if pvs else -beta
+                value = -self.negamax(node, depth - 1 - reduction, a, -alpha, ply + 1).score
+                if reduction and value > alpha:
+                    value = -self.negamax(node, depth - 1, a, -alpha, ply + 1).score
+                if pvs and alpha < value < beta:
+                    value = -self.negamax(node, depth - 1, -beta, -alpha, ply + 1).score
+            score = max(score, value)
             self.unmake_move(move)
             if score > alpha or score >= MATE_LOWER:
                 alpha = score
                 best = move
             if alpha >= beta:
-                update_killers(move, score, depth)
+                if quiet:
+                    self.update_quiet_stats(node, move, depth, ply, score, quiets_tried)
                 break
+            if quiet:
+                quiets_tried.append(move)
+
+        if self.stopped:  # the subtree was cut short, so the score can't be trusted
+            return SearchResult()
 
-        result = SearchResult(depth, score, best, alpha, beta)
+        result = SearchResult(depth, score, MOVES[best] if best is not None else None, alpha, beta)
         if score <= _alpha:
             result.nodetype = NodeType.BETA
         elif score >= beta:
@@ -0,0 +1,101 @@
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import List, Union
+
+from .position import Position
+from .search import Searcher, SearchOptions
+from .transposition import TTable, GENERATION_MASK
+from .types import PositionSnapshot, SearchResult
+
+_helper_event = None
+
+
+def _init_helper(name: str, size_mb: int, event: "multiprocessing.Event") -> None:
+    global _helper_event
+    TTable.attach(name, size_mb)
+    _helper_event = event
+
+
+def _helper_search(
+    root: Union[str, PositionSnapshot],
+    moves: List[int],
+    depth: int,
+    worker_id: int,
+    generation: int,
+    options: SearchOptions,
+) -> int:
+    TTable.generation = generation
+    position = Position.from_moves(root, moves)
+    Searcher(event=_helper_event, worker_id=worker_id, options=options).search(position, depth)
+    return worker_id
+
+
+class LazySMPSearcher(Searcher):
+    """Lazy SMP search.
+
+    Helper processes run iterative deepening on the same root as the main search, sharing
+    one lockless transposition table. Nothing is exchanged between them except through the
+    table, and the result is read back from the root entry as for a single searcher.
+    """
+
+    def __init__(
+        self, event: "threading.Event" = None, workers: int = 1, options: SearchOptions = None
+    ):
+        super().__init__(event=event, options=options)
+        self.__workers = workers
+        self.__context = get_context()
+        self.__helper_event = self.__context.Event()
+        self.__pool = None
+        self.__pool_table = None
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @workers.setter
+    def workers(self, value: int) -> None:
+        if value != self.__workers:
+            self.close()
+        self.__workers = value
+
+    def __get_pool(self) -> ProcessPoolExecutor:
+        name = TTable.share()
+        if self.__pool is None or self.__pool_table != name:
+            self.close()
+            self.__pool = ProcessPoolExecutor(
+                max_workers=self.__workers - 1,
+                mp_context=self.__context,
+                initializer=_init_helper,
+                initargs=(name, TTable.size_mb, self.__helper_event),
+            )
+            self.__pool_table = name
+        return self.__pool
+
+    def search(self, p: Position, depth: int = 1) -> SearchResult:
+        if self.__workers < 2:
+            return super().search(p, depth)
+
+        pool = self.__get_pool()
+        root, moves = p.history
+        generation = (TTable.generation + 1) & GENERATION_MASK  # bumped by the main search
+        self.__helper_event.clear()
+        helpers = [
+            pool.submit(_helper_search, root, moves, depth, worker_id, generation, self.options)
+            for worker_id in range(1, self.__workers)
+        ]
+        try:
+            result = super().search(p, depth)
+        finally:
+            self.__helper_event.set()
+            wait(helpers)
+        for helper in helpers:  # a helper that died would otherwise go unnoticed
+            if helper.exception() is not None:
+                raise helper.exception()
+        return result
+
+    def close(self) -> None:
+        if self.__pool is not None:
+            self.__helper_event.set()
+            self.__pool.shutdown(wait=True)
+        self.__pool = None
+        self.__pool_table = None
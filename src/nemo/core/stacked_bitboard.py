@@ -1,11 +1,13 @@
-from collections import defaultdict
 from typing import Callable, Dict, List, Generator, Tuple, Optional
 
 from .exceptions import IllegalMoveException
+from .psqt import PIECE_VALUES, PIECE_SQUARE_TABLES, ENDGAME_PIECE_SQUARE_TABLES, PHASE_MATERIAL
 from .types import (
     AbstractPiece as Piece,
     Bitboard,
     Color,
+    BOARD_COUNT,
+    OCCUPANCY,
     PieceType,
     Square,
     State,
@@ -17,6 +19,8 @@ from .types import (
     PIECE_REGISTRY,
     XRAYS,
 )
+from .magic import BETWEEN, Magic
+from .move_gen import BISHOP_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, QUEEN_ATTACKS, ROOK_ATTACKS
 from .utils import (
     bitscan_forward,
     iter_bitscan_forward,
@@ -46,12 +50,12 @@ class PieceCache(dict):
 class StackedBitboard:
     __piece_cache = PieceCache()
 
-    def __init__(self, bitboards_by_color_and_type, square_occupancy):
-        self.__boards = bitboards_by_color_and_type
-        self.__color_occupancy = [
-            self.__white_occupancy(),
-            self.__black_occupancy(),
-        ]
+    def __init__(self, boards: List[Bitboard], square_occupancy):
+        """``boards`` are the piece and en-passant bitboards at ``color * 8 + piece_type``;
+        the occupancy slots are filled in here."""
+        self.__boards = boards
+        for c in (Color.WHITE, Color.BLACK):
+            boards[c * 8 + OCCUPANCY] = self.__compute_occupancy(c)
         self.__square_occupancy = square_occupancy
         self.__attack_sets = None
         self.__initialize_attack_sets()
@@ -63,41 +67,85 @@ class StackedBitboard:
         self.__check_sets = None
         self.__checkmated = None
         self.__initialize_check_sets()
+        self.__color_attacks = {}  # attacks_by_color, filled on demand until the next move
+
+        # material and (midgame, endgame) piece-square scores, updated as pieces move
+        self.__material, self.__psq_mg, self.__psq_eg = self.compute_scores()
+
+    def copy(self) -> "StackedBitboard":
+        """A copy sharing nothing mutable, without recomputing the derived sets and scores.
+
+        The pin, check and attack sets are replaced rather than updated in place, so they
+        are shared until either copy moves.
+        """
+        other = self.__class__.__new__(self.__class__)
+        other.__boards = list(self.__boards)
+        other.__square_occupancy = list(self.__square_occupancy)
+        other.__attack_sets = self.__attack_sets
+        other.__pin_sets = self.__pin_sets
+        other.__check_sets = self.__check_sets
+        other.__color_attacks = self.__color_attacks
+        other.__checkmated = self.__checkmated
+        other.__material = list(self.__material)
+        other.__psq_mg = list(self.__psq_mg)
+        other.__psq_eg = list(self.__psq_eg)
+        return other
 
     @classmethod
     def test_piece(cls, c: Color, piece_type: PieceType) -> Piece:
         return cls.__piece_cache[(c, piece_type)]
 
     def __initialize_attack_sets(self) -> None:
-        attack_sets = {Color.WHITE: {}, Color.BLACK: {}}
-        for c in self.__boards:
+        attack_sets = [EMPTY] * BOARD_COUNT
+        for c in (Color.WHITE, Color.BLACK):
             for piece_type in ATTACKERS:
-                attack_sets[c][piece_type] = self.test_piece(
+                attack_sets[c * 8 + piece_type] = self.test_piece(
                     c, piece_type
                 ).attack_set_empty(self)
         self.__attack_sets = attack_sets
 
     def __initialize_pin_sets(self) -> None:
-        self.__compute_pin_set()
+        self.__pin_sets = {c: self.__compute_pins(c) for c in (Color.WHITE, Color.BLACK)}
 
-    def __compute_pin_set(self) -> None:
-        pin_sets = {Color.WHITE: Bitboard(0), Color.BLACK: Bitboard(0)}
-        for c in self.__boards:
+    def __compute_pins(self, c: Color) -> Bitboard:
+        """Pieces of color ``c`` pinned to their king.
+
+        Only enemy sliders on an empty-board line through the king can pin, and they pin the
+        one piece between them and the king if it is ``c``'s own.
+        """
+        king_square = bitscan_forward(self.king_bb(c))
+        boards, other = self.__boards, (~c) * 8
+        occupancy = boards[OCCUPANCY] | boards[8 + OCCUPANCY]
+        own = boards[c * 8 + OCCUPANCY]
+        queens = boards[other + PieceType.QUEEN]
+        line = king_square * 64
+        pins = EMPTY
+        for piece_type, rays in ((PieceType.ROOK, ROOK_ATTACKS), (PieceType.BISHOP, BISHOP_ATTACKS)):
+            for square in iter_bitscan_forward((boards[other + piece_type] | queens) & rays[king_square]):
+                blockers = BETWEEN[line + square] & occupancy
+                if blockers & own and not blockers & (blockers - 1):
+                    pins |= blockers
+        return pins
+
+    def __compute_pin_set(self) -> Dict[Color, Bitboard]:
+        """Pins for both colors from every enemy slider; the reference for ``check_pins_and_checkers``."""
+        pin_sets = {Color.WHITE: EMPTY, Color.BLACK: EMPTY}
+        for c in (Color.WHITE, Color.BLACK):
             king_bb = self.king_bb(c)
             king_square = bitscan_forward(king_bb)
             for piece_type in {PieceType.BISHOP, PieceType.ROOK}:
-                for square in iter_bitscan_forward(self.__boards[~c][piece_type]):
+                for square in iter_bitscan_forward(self.__boards[(~c) * 8 + piece_type]):
                     pin_sets[c] |= self.__test_pin_set(
                         c, piece_type, king_bb, king_square, square
                     )
 
                 # Queen
-                for square in iter_bitscan_forward(self.__boards[~c][PieceType.QUEEN]):
+                for square in iter_bitscan_forward(self.__boards[(~c) * 8 + PieceType.QUEEN]):
                     pin_sets[c] |= self.__test_pin_set(
                         c, piece_type, king_bb, king_square, square
                     )
 
-        self.__pin_sets = pin_sets
+        return pin_sets
 
     def __test_pin_set(
         self,
@@ -132,6 +180,14 @@ class StackedBitboard:
         return self.__pin_sets[c]
 
     def attacks_by_color(self, c: Color) -> Bitboard:
+        """Squares attacked by color ``c``, computed once per position and kept with the pins."""
+        attack_bb = self.__color_attacks.get(c)
+        if attack_bb is None:
+            attack_bb = self.__compute_attacks_by_color(c)
+            self.__color_attacks[c] = attack_bb
+        return attack_bb
+
+    def __compute_attacks_by_color(self, c: Color) -> Bitboard:
         attack_bb = EMPTY
         for piece_type in ATTACKERS:
             attack_bb |= self.test_piece(
@@ -142,13 +198,73 @@ class StackedBitboard:
     def __compute_checkers(self, c: Color) -> Bitboard:
         """Bitboard representing pieces that can check the King of color `c`"""
         checkers_bb = EMPTY
-        king_bb = self.__boards[c][PieceType.KING]
+        king_bb = self.__boards[c * 8 + PieceType.KING]
         for piece, piece_bb in self.iter_check_candidates(~c):
             for s in iter_bitscan_forward(piece_bb):
                 if piece.attack_set_on(self, s) & king_bb:
                     checkers_bb |= 1 << s
         return checkers_bb
 
+    def __checkers_through(self, c: Color, changed_bb: Bitboard) -> Bitboard:
+        """Pieces checking the king of color ``c`` that stand on or look through ``changed_bb``."""
+        boards, other = self.__boards, (~c) * 8
+        king_bb = boards[c * 8 + PieceType.KING]
+        king_square = bitscan_forward(king_bb)
+        checkers_bb = (
+            (KNIGHT_ATTACKS[king_square] & boards[other + PieceType.KNIGHT])
+            | (PAWN_ATTACKS[c](king_bb) & boards[other + PieceType.PAWN])
+        ) & changed_bb
+        if changed_bb & QUEEN_ATTACKS[king_square]:
+            occupancy = boards[OCCUPANCY] | boards[8 + OCCUPANCY]
+            queens = boards[other + PieceType.QUEEN]
+            checkers_bb |= Magic.rook_attacks(king_square, occupancy) & (
+                boards[other + PieceType.ROOK] | queens
+            )
+            checkers_bb |= Magic.bishop_attacks(king_square, occupancy) & (
+                boards[other + PieceType.BISHOP] | queens
+            )
+        return checkers_bb
+
+    def update_pins_and_checkers(self, c: Color, changed_bb: Bitboard) -> None:
+        """Updates pins and checkers once color ``c`` has moved, changing ``changed_bb``.
+
+        A king's pins can only change when a changed square lies on a line through it. The
+        mover can't be left in check, and the opponent can only be checked by a piece that
+        landed on a changed square or by a slider looking through one. The attacks by color
+        are dropped, to be recomputed when next asked for.
+        """
+        pin_sets = dict(self.__pin_sets)
+        for side in (c, ~c):
+            king_bb = self.__boards[side * 8 + PieceType.KING]
+            if changed_bb & (QUEEN_ATTACKS[bitscan_forward(king_bb)] | king_bb):
+                pin_sets[side] = self.__compute_pins(side)
+        self.__pin_sets = pin_sets
+        self.__check_sets = {c: EMPTY, ~c: self.__checkers_through(~c, changed_bb)}
+        self.__color_attacks = {}
+
+    @property
+    def pins_and_checkers(
+        self,
+    ) -> Tuple[Dict[Color, Bitboard], Dict[Color, Bitboard], Dict[Color, Bitboard]]:
+        """Snapshot of the pin, check and attack sets, for ``restore_pins_and_checkers`` on unmake."""
+        return self.__pin_sets, self.__check_sets, self.__color_attacks
+
+    def restore_pins_and_checkers(
+        self, snapshot: Tuple[Dict[Color, Bitboard], Dict[Color, Bitboard], Dict[Color, Bitboard]]
+    ) -> None:
+        self.__pin_sets, self.__check_sets, self.__color_attacks = snapshot
+
+    def check_pins_and_checkers(self) -> None:
+        """Debug check of the incremental pin and check sets against a full recomputation."""
+        expected = (
+            self.__compute_pin_set(),
+            {c: self.__compute_checkers(c) for c in (Color.WHITE, Color.BLACK)},
+        )
+        actual = (self.__pin_sets, self.__check_sets)
+        assert actual == expected, f"incremental pins/checkers {actual} != {expected}"
+        for c, attack_bb in self.__color_attacks.items():
+            assert attack_bb == self.__compute_attacks_by_color(c), f"stale attacks by {c}"
+
     def __initialize_check_sets(self) -> None:
         """Bitboard representing pieces that can check the King of color `c`"""
         self.__check_sets = {
@@ -168,50 +284,43 @@ class StackedBitboard:
     def is_checkmate(self):
         return self.__checkmated is not None
 
-    def __white_occupancy(self) -> Bitboard:
-        occ = EMPTY
-        for piece_type, bb in self.__boards[Color.WHITE].items():
-            if piece_type != PieceType.ENPASSANT:
-                occ |= bb
-        return occ
-
-    def __black_occupancy(self) -> Bitboard:
+    def __compute_occupancy(self, c: Color) -> Bitboard:
         occ = EMPTY
-        for piece_type, bb in self.__boards[Color.BLACK].items():
-            if piece_type != PieceType.ENPASSANT:
-                occ |= bb
+        for piece_type in MOVABLE:
+            occ |= self.__boards[c * 8 + piece_type]
         return occ
 
     @property
     def occupancy(self) -> Bitboard:
-        return self.by_color(Color.WHITE) | self.by_color(Color.BLACK)
+        return self.__boards[OCCUPANCY] | self.__boards[8 + OCCUPANCY]
 
     @property
     def squares(self) -> List[Piece]:
         return self.__square_occupancy
 
     @property
-    def boards(self) -> Dict[Color, Dict[PieceType, Bitboard]]:
+    def boards(self) -> List[Bitboard]:
+        """Every bitboard, at ``color * 8 + piece_type``; occupancy at ``color * 8 + OCCUPANCY``."""
         return self.__boards
 
     def piece_at(self, s: Square) -> Piece:
         return self.squares[s]
 
     def board_for(self, p: Piece) -> Bitboard:
-        return self.__boards[p.color][p._type]
+        return self.__boards[p.color * 8 + p._type]
 
     def by_color(self, c: Color) -> Bitboard:
-        return self.__color_occupancy[c]
+        return self.__boards[c * 8 + OCCUPANCY]
 
     def king_bb(self, c: Color) -> Bitboard:
-        return self.__boards[c][PieceType.KING]
+        return self.__boards[c * 8 + PieceType.KING]
 
     def get_king(self, c: Color) -> Piece:
-        s = bitscan_forward(self.__boards[c][PieceType.KING])
+        s = bitscan_forward(self.__boards[c * 8 + PieceType.KING])
         return self.__square_occupancy[s]
 
     def get_king_square(self, c: Color) -> Square:
-        return bitscan_forward(self.__boards[c][PieceType.KING])
+        return bitscan_forward(self.__boards[c * 8 + PieceType.KING])
 
     def get_checker(self, c: Color) -> Tuple[Bitboard, Piece, Square]:
         """Gets a singular checking bitboard, piece, and square against the king of color ``c`.`
@@ -224,96 +333,115 @@ class StackedBitboard:
     def move_piece(
         self, _from: int, _to: int, p: Piece, drop: Piece = None
     ) -> Optional[Piece]:
-        _from_bb = _from.bitboard
-        _to_bb = _to.bitboard
+        _from_bb = 1 << _from
+        _to_bb = 1 << _to
         _from_to_bb = _from_bb | _to_bb
         captured = self.piece_at(_to)
         # if p is None:
         #     raise IllegalMoveException()
         c = p.color
+        boards, own, other = self.__boards, c * 8, (~c) * 8
 
         if captured is not None:  # need to toggle the square on the piece bb
             # assert captured._type != PieceType.KING
-            _type = captured._type
-            self.__boards[~c][_type] ^= _to_bb
-            self.__color_occupancy[~c] ^= _to_bb
-            self.__attack_sets[~c][_type] = self.test_piece(~c, _type).attack_set_empty(
-                self
-            )
+            self.__update_scores(captured, _to, -1)
+            boards[other + captured._type] ^= _to_bb
+            boards[other + OCCUPANCY] ^= _to_bb
 
         if drop is not None:
-            _type = drop._type
-            self.__boards[~c][_type] ^= _from_bb
-            self.__color_occupancy[~c] ^= _from_bb
-            self.__attack_sets[~c][_type] = self.test_piece(~c, _type).attack_set_empty(
-                self
-            )
+            self.__update_scores(drop, _from, 1)
+            boards[other + drop._type] ^= _from_bb
+            boards[other + OCCUPANCY] ^= _from_bb
 
-        self.__boards[c][p._type] ^= _from_to_bb
-        self.__color_occupancy[c] ^= _from_to_bb
-        self.__attack_sets[c][p._type] = self.test_piece(c, p._type).attack_set_empty(
-            self
-        )
+        self.__update_scores(p, _from, -1)
+        self.__update_scores(p, _to, 1)
+        boards[own + p._type] ^= _from_to_bb
+        boards[own + OCCUPANCY] ^= _from_to_bb
 
         self.squares[_to] = p
         self.squares[_from] = drop
-
-        # recalculate pinned pieces
-        self.__compute_pin_set()
-        self.__check_sets[~c] = self.__compute_checkers(~c)
+        self.__attack_sets = None
         return captured
 
     def place_piece(self, s: Square, p: Piece) -> None:
         existing_piece_at_s = self.piece_at(s)
-        placing_piece_bb = self.board_for(p)
         c = p.color
-        s_bb = s.bitboard
+        boards, own, other = self.__boards, c * 8, (~c) * 8
+        s_bb = 1 << s
         if existing_piece_at_s is not None:
-            _type = existing_piece_at_s._type
-            self.__boards[~c][_type] ^= s_bb
-            self.__color_occupancy[~c] ^= s_bb
-            self.__attack_sets[~c][_type] = self.test_piece(~c, _type).attack_set_empty(
-                self
-            )
+            self.__update_scores(existing_piece_at_s, s, -1)
+            boards[other + existing_piece_at_s._type] ^= s_bb
+            boards[other + OCCUPANCY] ^= s_bb
 
-        self.__boards[c][p._type] ^= s_bb  # Set the bit for the new piece
-        self.__color_occupancy[c] ^= s_bb
-        self.__attack_sets[c][p._type] = self.test_piece(c, p._type).attack_set_empty(
-            self
-        )
+        self.__update_scores(p, s, 1)
+        boards[own + p._type] ^= s_bb  # Set the bit for the new piece
+        boards[own + OCCUPANCY] ^= s_bb
 
         self.squares[s] = p
-
-        # recalculate pinned pieces
-        self.__compute_pin_set()
-        self.__check_sets[~c] = self.__compute_checkers(~c)
+        self.__attack_sets = None
         return existing_piece_at_s
 
     def remove_piece(self, s: Square) -> None:
-        if not isinstance(s, Square):
-            s = Square(s)
         existing_piece_at_s = self.piece_at(s)
-        s_bb = s.bitboard
+        s_bb = 1 << s
         if existing_piece_at_s is not None:
-            c = existing_piece_at_s.color
-            _type = existing_piece_at_s._type
-            self.__boards[c][_type] ^= s_bb
-            self.__color_occupancy[c] ^= s_bb
-            self.__attack_sets[c][_type] = self.test_piece(c, _type).attack_set_empty(
-                self
-            )
+            self.__update_scores(existing_piece_at_s, s, -1)
+            own = existing_piece_at_s.color * 8
+            self.__boards[own + existing_piece_at_s._type] ^= s_bb
+            self.__boards[own + OCCUPANCY] ^= s_bb
         self.squares[s] = None
-
-        # recalculate pinned pieces
-        self.__compute_pin_set()
+        self.__attack_sets = None
         return existing_piece_at_s
 
+    def __update_scores(self, p: Piece, s: int, sign: int) -> None:
+        c, _type = p.color, p._type
+        if _type != PieceType.KING:
+            self.__material[c] += sign * PIECE_VALUES[_type]
+        self.__psq_mg[c] += sign * PIECE_SQUARE_TABLES[c][_type][s]
+        self.__psq_eg[c] += sign * ENDGAME_PIECE_SQUARE_TABLES[c][_type][s]
+
+    def compute_scores(self) -> Tuple[List[int], List[int], List[int]]:
+        """Material, midgame and endgame piece-square scores by color, from scratch."""
+        material, psq_mg, psq_eg = [0, 0], [0, 0], [0, 0]
+        for s, p in enumerate(self.__square_occupancy):
+            if p is None:
+                continue
+            c, _type = p.color, p._type
+            if _type != PieceType.KING:
+                material[c] += PIECE_VALUES[_type]
+            psq_mg[c] += PIECE_SQUARE_TABLES[c][_type][s]
+            psq_eg[c] += ENDGAME_PIECE_SQUARE_TABLES[c][_type][s]
+        return material, psq_mg, psq_eg
+
+    def check_scores(self) -> None:
+        """Debug check of the incremental scores against ``compute_scores``."""
+        expected = self.compute_scores()
+        actual = (self.__material, self.__psq_mg, self.__psq_eg)
+        assert actual == expected, f"incremental scores {actual} != {expected}"
+
+    def material(self, c: Color) -> int:
+        """Material of color ``c``, excluding the king."""
+        return self.__material[c]
+
+    def psq(self, c: Color) -> Tuple[int, int]:
+        """Midgame and endgame piece-square scores of color ``c``."""
+        return self.__psq_mg[c], self.__psq_eg[c]
+
+    @property
+    def phase(self) -> int:
+        """Non-pawn material left on the board, from ``PHASE_MATERIAL`` at the start to 0."""
+        pawns = popcnt(
+            self.__boards[PieceType.PAWN] | self.__boards[8 + PieceType.PAWN]
+        )
+        material = self.__material[Color.WHITE] + self.__material[Color.BLACK]
+        return min(PHASE_MATERIAL, material - pawns * PIECE_VALUES[PieceType.PAWN])
+
     def toggle_enpassant_board(self, c: Color, s: Square = None) -> None:
-        bb = s.bitboard if s is not None else EMPTY
-        self.__boards[c][PieceType.ENPASSANT] = bb
+        bb = 1 << s if s is not None else EMPTY
+        self.__boards[c * 8 + PieceType.ENPASSANT] = bb
 
     def ep_board(self, c: Color) -> Bitboard:
-        return self.__boards[c][PieceType.ENPASSANT]
+        return self.__boards[c * 8 + PieceType.ENPASSANT]
 
     def iterpieces(self, c: Color) -> Generator[Piece, None, None]:
         for piece_type in MOVABLE:
@@ -321,25 +449,25 @@ class StackedBitboard:
 
     def iter_check_candidates(self, c: Color) -> Generator[Piece, None, None]:
         for piece_type in CAN_CHECK:
-            piece_bb = self.__boards[c][piece_type]
+            piece_bb = self.__boards[c * 8 + piece_type]
             if piece_bb:
                 yield self.test_piece(c, piece_type), piece_bb
 
     def iter_material(
         self, c: Color
     ) -> Generator[Tuple[PieceType, Bitboard, Bitboard], None, None]:
+        own, other = c * 8, (~c) * 8
         for piece_type in CAN_CHECK:
-            yield piece_type, self.__boards[c][piece_type], self.__boards[~c][
-                piece_type
-            ]
+            yield piece_type, self.__boards[own + piece_type], self.__boards[other + piece_type]
 
     def iter_attacks(
         self, c: Color
     ) -> Generator[Tuple[PieceType, Bitboard, Bitboard], None, None]:
+        if self.__attack_sets is None:  # stale since the last move, see move_piece
+            self.__initialize_attack_sets()
+        attack_sets, own, other = self.__attack_sets, c * 8, (~c) * 8
         for piece_type in MOVABLE:
-            yield piece_type, self.__attack_sets[c][piece_type], self.__attack_sets[~c][
-                piece_type
-            ]
+            yield piece_type, attack_sets[own + piece_type], attack_sets[other + piece_type]
 
     @property
     def attack_defend_bb(self) -> Bitboard:
@@ -350,12 +478,12 @@ class StackedBitboard:
         attack_defend_bb = EMPTY
         for pt in MOVABLE:
             attacker_p, defender_p = self.test_piece(attacker, pt), self.test_piece(defender, pt)
-            for s in iter_bitscan_forward(self.__boards[attacker][pt]):
-                if attacker_p._attack_set(attacker, Bitboard(1 << s), self, target=Bitboard(1 << _to)):
+            for s in iter_bitscan_forward(self.__boards[attacker * 8 + pt]):
+                if attacker_p._attack_set(attacker, 1 << s, self, target=1 << _to):
                     attack_defend_bb |= (1 << s)
 
-            for s in iter_bitscan_forward(self.__boards[defender][pt]):
-                if defender_p._defend_set(defender, Bitboard(1 << s), self, target=Bitboard(1 << _to)):
+            for s in iter_bitscan_forward(self.__boards[defender * 8 + pt]):
+                if defender_p._defend_set(defender, 1 << s, self, target=1 << _to):
                     attack_defend_bb |= (1 << s)
         return attack_defend_bb
 
@@ -363,12 +491,24 @@ class StackedBitboard:
     def xrays_bb(self) -> Bitboard:
         bb = EMPTY
         for pt in XRAYS:
-            bb |= (self.__boards[Color.WHITE][pt] | self.__boards[Color.BLACK][pt])
+            bb |= (self.__boards[pt] | self.__boards[8 + pt])
         return bb
 
     def __hash__(self) -> int:
+        return self.board_hash()
+
+    def board_hash(self) -> int:
+        """Zobrist key of every piece; ``hash()`` would fold it into a machine word."""
         h = 0
         for s, p in enumerate(self.__square_occupancy):
             if p is not None:
                 h ^= ZOBRIST_KEYS[p.zobrist_index][s]
         return h
+
+    def pawn_hash(self) -> int:
+        """Zobrist key of the pawns alone."""
+        h = 0
+        for s, p in enumerate(self.__square_occupancy):
+            if p is not None and p._type == PieceType.PAWN:
+                h ^= ZOBRIST_KEYS[p.zobrist_index][s]
+        return h
@@ -1,18 +1,231 @@
+import atexit
+
+from array import array
 from collections import deque, defaultdict
-from typing import Any, List
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, List, Optional, Tuple
 
-class _TranspositionTable(dict):
-    def __init__(self, max_size = 10**8):
-        super().__init__()
-        self.__max_size = max_size
-        self.__stack = deque([])
+from .constants import INFINITY, TTABLE_SIZE_MB, EVAL_CACHE_SIZE, PAWN_HASH_SIZE, PERFT_HASH_SIZE_MB
+from .move import MOVES
+from .types import Color, NodeType, SearchResult
 
-    def __setitem__(self, key: int, value: "SearchResult") -> None:
-        if len(self.__stack) >= self.__max_size:
-            self.pop(self.__stack[-1], None)
-            self.__stack.pop()
-        self.__stack.appendleft(key)
-        super().__setitem__(key, value)
+# Each slot is two 64-bit words: the data word and the key XOR'd with the data word.
+ENTRY_SIZE = 16
+BUCKET_SIZE = 4
+PERFT_ENTRY_SIZE = 17  # key, count and depth
+
+HISTORY_MAX = 1 << 20
+
+"""
+Packed data word layout
+
+    63            32 31    26 25  24 23     16 15            0
+    ├───────────────┼────────┼──────┼─────────┼───────────────┤
+    │ score (+2^31) │  gen   │bound │  depth  │     move      │
+    └───────────────┴────────┴──────┴─────────┴───────────────┘
+
+"""
+MOVE_MASK = 0xFFFF
+DEPTH_SHIFT = 16
+DEPTH_MASK = 0xFF
+BOUND_SHIFT = 24
+BOUND_MASK = 0x3
+GENERATION_SHIFT = 26
+GENERATION_MASK = 0x3F
+SCORE_SHIFT = 32
+SCORE_OFFSET = 1 << 31
+SCORE_INFINITE = (1 << 31) - 1
+
+NO_BOUND = 3  # SearchResult.nodetype is None
+
+
+def pack_score(score: float) -> int:
+    if score == INFINITY:
+        return SCORE_INFINITE
+    elif score == -INFINITY:
+        return -SCORE_INFINITE
+    return max(-SCORE_INFINITE + 1, min(SCORE_INFINITE - 1, int(round(score))))
+
+
+def unpack_score(v: int) -> float:
+    if v == SCORE_INFINITE:
+        return INFINITY
+    elif v == -SCORE_INFINITE:
+        return -INFINITY
+    return v
+
+
+class _TranspositionTable:
+    """Fixed-size transposition table sized in megabytes.
+
+    Entries are packed into a preallocated ``array('Q')`` and grouped into buckets of
+    ``bucket_size`` slots. On a store, an entry with the same key is overwritten in place,
+    otherwise the shallowest entry from the oldest search generation is replaced.
+
+    The table can be moved into shared memory with ``share`` and attached to by name from
+    other processes. Slots are read and written without locks: a torn write leaves a slot
+    whose key word no longer XORs back to the probed key, so it reads as a miss.
+    """
+
+    def __init__(self, size_mb: int = TTABLE_SIZE_MB, bucket_size: int = BUCKET_SIZE):
+        self.__bucket_size = bucket_size
+        self.__generation = 0
+        self.__size_mb = size_mb
+        self.__mask = 0
+        self.__table = None
+        self.__shm = None
+        self.__owner = False
+        self.resize(size_mb)
+
+    def __n_buckets(self, size_mb: int) -> int:
+        n_buckets = max(1, (size_mb << 20) // (ENTRY_SIZE * self.__bucket_size))
+        return 1 << (n_buckets.bit_length() - 1)  # round down to a power of 2
+
+    def resize(self, size_mb: int) -> None:
+        self.close()
+        n_buckets = self.__n_buckets(size_mb)
+        self.__size_mb = size_mb
+        self.__mask = n_buckets - 1
+        self.__table = array("Q", [0]) * (2 * n_buckets * self.__bucket_size)
+
+    def share(self) -> str:
+        """Moves the table into shared memory and returns the name of the block."""
+        if self.__shm is None:
+            shm = SharedMemory(create=True, size=len(self.__table) * 8)
+            table = shm.buf[: len(self.__table) * 8].cast("Q")
+            table[:] = self.__table
+            self.__shm, self.__owner, self.__table = shm, True, table
+            atexit.register(self.close)
+        return self.__shm.name
+
+    def attach(self, name: str, size_mb: int) -> None:
+        """Attaches to a table shared by another process with ``share``."""
+        if self.__shm is not None and self.__shm.name == name:
+            return
+        self.close()
+        n_buckets = self.__n_buckets(size_mb)
+        shm = SharedMemory(name=name)
+        self.__size_mb = size_mb
+        self.__mask = n_buckets - 1
+        self.__table = shm.buf[: 16 * n_buckets * self.__bucket_size].cast("Q")
+        self.__shm, self.__owner = shm, False
+
+    def close(self) -> None:
+        """Detaches from shared memory, unlinking the block if this process created it."""
+        if self.__shm is None:
+            return
+        table = array("Q", self.__table)
+        self.__table.release()
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+        self.__shm, self.__owner, self.__table = None, False, table
+
+    @property
+    def shared(self) -> bool:
+        return self.__shm is not None
+
+    @property
+    def size_mb(self) -> int:
+        return self.__size_mb
+
+    @property
+    def capacity(self) -> int:
+        return len(self.__table) >> 1
+
+    @property
+    def generation(self) -> int:
+        return self.__generation
+
+    @generation.setter
+    def generation(self, value: int) -> None:
+        self.__generation = value & GENERATION_MASK
+
+    def new_search(self) -> None:
+        """Ages every entry currently in the table by one generation."""
+        self.__generation = (self.__generation + 1) & GENERATION_MASK
+
+    def pack(self, result: SearchResult) -> int:
+        move = result.move or 0
+        bound = NO_BOUND if result.nodetype is None else int(result.nodetype)
+        return (
+            (move & MOVE_MASK)
+            | ((max(0, min(DEPTH_MASK, result.ply)) & DEPTH_MASK) << DEPTH_SHIFT)
+            | (bound << BOUND_SHIFT)
+            | (self.__generation << GENERATION_SHIFT)
+            | ((pack_score(result.score) + SCORE_OFFSET) << SCORE_SHIFT)
+        )
+
+    @staticmethod
+    def unpack(data: int) -> SearchResult:
+        move = data & MOVE_MASK
+        bound = (data >> BOUND_SHIFT) & BOUND_MASK
+        return SearchResult(
+            ply=(data >> DEPTH_SHIFT) & DEPTH_MASK,
+            score=unpack_score((data >> SCORE_SHIFT) - SCORE_OFFSET),
+            move=MOVES[move] if move else None,
+            nodetype=NodeType(bound) if bound != NO_BOUND else None,
+        )
+
+    def probe(self, key: int) -> int:
+        """Returns the packed data word stored for ``key``, or 0."""
+        table = self.__table
+        i = ((key & self.__mask) * self.__bucket_size) << 1
+        for j in range(i, i + (self.__bucket_size << 1), 2):
+            data = table[j]
+            if data and table[j + 1] ^ data == key:
+                return data
+        return 0
+
+    def get(self, key: int, default: Any = None) -> Optional[SearchResult]:
+        data = self.probe(key)
+        if not data:
+            return default
+        return self.unpack(data)
+
+    def __getitem__(self, key: int) -> SearchResult:
+        data = self.probe(key)
+        if not data:
+            raise KeyError(key)
+        return self.unpack(data)
+
+    def __contains__(self, key: int) -> bool:
+        return self.probe(key) != 0
+
+    def __setitem__(self, key: int, value: SearchResult) -> None:
+        table = self.__table
+        generation = self.__generation
+        i = ((key & self.__mask) * self.__bucket_size) << 1
+        replace, worst = i, None
+        for j in range(i, i + (self.__bucket_size << 1), 2):
+            data = table[j]
+            if not data:
+                replace = j
+                break
+            if table[j + 1] ^ data == key:
+                replace = j
+                if value.move is None:  # keep the previous best move for this position
+                    value.move = self.unpack(data).move
+                break
+            age = (generation - (data >> GENERATION_SHIFT)) & GENERATION_MASK
+            worth = ((data >> DEPTH_SHIFT) & DEPTH_MASK) - 8 * age
+            if worst is None or worth < worst:
+                replace, worst = j, worth
+
+        data = self.pack(value)
+        table[replace] = data
+        table[replace + 1] = key ^ data
+
+    def hashfull(self) -> int:
+        """Permill of sampled slots written during the current search generation."""
+        table = self.__table
+        n = min(1000, len(table) >> 1)
+        used = sum(
+            1
+            for j in range(0, n << 1, 2)
+            if table[j] and ((table[j] >> GENERATION_SHIFT) & GENERATION_MASK) == self.__generation
+        )
+        return used * 1000 // n
 
     def extract_principal_variation(self, node: "Position") -> List["Move"]:
         results = []
@@ -35,6 +248,134 @@ class _TranspositionTable(dict):
         assert node.key == before
         return results
 
+    def clear(self) -> None:
+        self.__table[:] = array("Q", [0]) * len(self.__table)
+
+    def reset(self):
+        self.clear()
+
+
+class _EvaluationCache:
+    """Direct-mapped cache of static evaluations keyed by Zobrist key.
+
+    Each key maps to exactly one slot, and a store simply overwrites whatever was there.
+    """
+
+    def __init__(self, size: int = EVAL_CACHE_SIZE):
+        size = 1 << (size.bit_length() - 1)  # round down to a power of 2
+        self.__mask = size - 1
+        self.__keys = array("Q", [0]) * size
+        self.__scores = array("d", [0.0]) * size
+
+    def get(self, key: int, default: Any = None) -> Optional[float]:
+        i = key & self.__mask
+        if self.__keys[i] == key:
+            return self.__scores[i]
+        return default
+
+    def __setitem__(self, key: int, score: float) -> None:
+        i = key & self.__mask
+        self.__keys[i] = key
+        self.__scores[i] = score
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def clear(self) -> None:
+        self.__keys = array("Q", [0]) * len(self.__keys)
+
+
+class _PawnHashTable:
+    """Direct-mapped cache of pawn-structure terms keyed by the pawn Zobrist key.
+
+    Stores the (passed, isolated, doubled) terms from white's perspective, so a position
+    whose pawns haven't changed costs a single probe.
+    """
+
+    def __init__(self, size: int = PAWN_HASH_SIZE):
+        size = 1 << (size.bit_length() - 1)  # round down to a power of 2
+        self.__mask = size - 1
+        self.__keys = array("Q", [0]) * size
+        self.__terms = array("l", [0]) * (3 * size)
+
+    def get(self, key: int, default: Any = None) -> Optional[Tuple[int, int, int]]:
+        i = key & self.__mask
+        if self.__keys[i] == key:
+            j = 3 * i
+            return self.__terms[j], self.__terms[j + 1], self.__terms[j + 2]
+        return default
+
+    def __setitem__(self, key: int, terms: Tuple[int, int, int]) -> None:
+        i = key & self.__mask
+        self.__keys[i] = key
+        self.__terms[3 * i : 3 * i + 3] = array("l", terms)
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def clear(self) -> None:
+        self.__keys = array("Q", [0]) * len(self.__keys)
+        self.__terms = array("l", [0]) * len(self.__terms)
+
+
+class _PerftTable:
+    """Node counts keyed by position key and remaining depth, for hashed perft.
+
+    Each index holds two slots: the first keeps the deepest subtree stored there, the second
+    always takes the newest shallower count, or the entry the first slot just gave up, so
+    shallow counts can't push out expensive ones.
+    """
+
+    def __init__(self, size_mb: int = PERFT_HASH_SIZE_MB):
+        n = max(1, (size_mb << 20) // (2 * PERFT_ENTRY_SIZE))
+        n = 1 << (n.bit_length() - 1)  # round down to a power of 2
+        self.__mask = n - 1
+        self.__keys = array("Q", [0]) * (2 * n)
+        self.__counts = array("Q", [0]) * (2 * n)
+        self.__depths = array("B", [0]) * (2 * n)
+
+    def get(self, key: int, depth: int) -> Optional[int]:
+        """Returns the stored count for ``key`` at ``depth``, or None."""
+        i = (key & self.__mask) << 1
+        keys, depths = self.__keys, self.__depths
+        if keys[i] == key and depths[i] == depth:
+            return self.__counts[i]
+        if keys[i + 1] == key and depths[i + 1] == depth:
+            return self.__counts[i + 1]
+        return None
+
+    def store(self, key: int, depth: int, count: int) -> None:
+        i = (key & self.__mask) << 1
+        keys, depths, counts = self.__keys, self.__depths, self.__counts
+        if depth < depths[i]:
+            i += 1
+        elif depths[i]:  # demote the replaced entry into the always-replace slot
+            keys[i + 1], depths[i + 1], counts[i + 1] = keys[i], depths[i], counts[i]
+        keys[i] = key
+        depths[i] = depth
+        counts[i] = count
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def clear(self) -> None:
+        self.__keys = array("Q", [0]) * len(self.__keys)
+        self.__depths = array("B", [0]) * len(self.__depths)
+
+
+class _BoundedTable(dict):
+    def __init__(self, max_size = 10**8):
+        super().__init__()
+        self.__max_size = max_size
+        self.__stack = deque([])
+
+    def __setitem__(self, key: int, value: Any) -> None:
+        if len(self.__stack) >= self.__max_size:
+            self.pop(self.__stack[-1], None)
+            self.__stack.pop()
+        self.__stack.appendleft(key)
+        super().__setitem__(key, value)
+
     def reset(self):
         self.clear()
 
@@ -43,5 +384,77 @@ class _TranspositionTable(dict):
 
 
 
+class _HistoryTable:
+    """Butterfly history of quiet moves, flat and indexed by [color][from][to].
+
+    Quiet moves that cause a beta cutoff gain ``depth ** 2``; the quiet moves searched before
+    them lose as much. Scores are halved towards zero between iterations and whenever one
+    grows past ``HISTORY_MAX`` either way, so recent cutoffs outweigh old ones.
+    """
+
+    def __init__(self):
+        self.__table = array("l", [0]) * (2 * 64 * 64)
+
+    @staticmethod
+    def index(c: Color, move: int) -> int:
+        return (c << 12) | (move & 0xFFF)
+
+    def score(self, c: Color, move: int) -> int:
+        return self.__table[(c << 12) | (move & 0xFFF)]
+
+    def update(self, c: Color, move: int, depth: int, tried: List[int] = ()) -> None:
+        table = self.__table
+        bonus = depth * depth
+        saturated = False
+        for other in tried:
+            j = (c << 12) | (other & 0xFFF)
+            table[j] -= bonus
+            saturated = saturated or table[j] <= -HISTORY_MAX
+        i = (c << 12) | (move & 0xFFF)
+        table[i] += bonus
+        if saturated or table[i] >= HISTORY_MAX:
+            self.age()
+
+    def age(self) -> None:
+        # int(v / 2) rounds towards zero, where v >> 1 would leave -1 at -1 for good
+        self.__table = array("l", (int(v / 2) for v in self.__table))
+
+    def clear(self) -> None:
+        self.__table = array("l", [0]) * (2 * 64 * 64)
+
+
+class _CounterMoveTable:
+    """The quiet reply that last refuted a move, flat and indexed by [color][from][to] of that move."""
+
+    def __init__(self):
+        self.__table = array("H", [0]) * (2 * 64 * 64)
+
+    def get(self, c: Color, previous: Optional[int]) -> Optional[int]:
+        if previous is None:
+            return None
+        return self.__table[(c << 12) | (previous & 0xFFF)] or None
+
+    def update(self, c: Color, previous: Optional[int], move: int) -> None:
+        if previous is not None:
+            self.__table[(c << 12) | (previous & 0xFFF)] = move
+
+    def clear(self) -> None:
+        self.__table = array("H", [0]) * (2 * 64 * 64)
+
+
 TTable = _TranspositionTable()
-Killers = defaultdict(lambda: _TranspositionTable(max_size=2))
\ No newline at end of file
+Killers = defaultdict(lambda: _BoundedTable(max_size=2))
+History = _HistoryTable()
+CounterMoves = _CounterMoveTable()
+EvalCache = _EvaluationCache()
+PawnHash = _PawnHashTable()
+
+
+def clear_tables() -> None:
+    """Empties every table the search learns from, e.g. between games."""
+    TTable.clear()
+    Killers.clear()
+    History.clear()
+    CounterMoves.clear()
+    EvalCache.clear()
+    PawnHash.clear()
@@ -3,9 +3,9 @@ from collections import deque, defaultdict
 from dataclasses import dataclass
 from enum import IntEnum
 from functools import reduce, lru_cache
-from itertools import chain
+from itertools import chain, islice
 from operator import ior
-from typing import Union, NamedTuple, Generator, Dict
+from typing import Union, NamedTuple, Generator, Dict, Optional, Tuple
 
 from .constants import (
     INFINITY,
@@ -13,33 +13,21 @@ from .constants import (
     MAX_SQUARE,
     MAX_INT,
     STARTING_FEN,
+    UNDO_STACK_SIZE,
+    COPY_UNDO_STACK_SIZE,
 )
 from .utils import bitscan_forward
 
-class _Bitboard(int):
-    def hexstring(self):
-        return hex(self)
+# Bitboards are plain ints in [0, MAX_INT]. Complements are taken as ``MAX_INT ^ bb``
+# and left shifts masked wherever they can carry bits past square 63.
+Bitboard = int
 
-    def __invert__(self):
-        return _Bitboard(MAX_INT ^ self)
-
-    def __and__(self, other):
-        return _Bitboard(int(other).__and__(self))
 
-    def __rand__(self, other):
-        return _Bitboard(int(other).__and__(self))
-
-    def __xor__(self, other):
-        return _Bitboard(int(other).__xor__(self))
-
-    def __rxor__(self, other):
-        return _Bitboard(int(other).__xor__(self))
-
-    def __or__(self, other):
-        return _Bitboard(int(other).__or__(self))
+class _Bitboard(int):
+    """Pretty-printing view of a bitboard, for debugging and display only."""
 
-    def __ror__(self, other):
-        return _Bitboard(int(other).__or__(self))
+    def hexstring(self):
+        return hex(self)
 
     def __repr__(self):
         n = 8
@@ -53,11 +41,13 @@ class _Bitboard(int):
         return repr(self)
 
 
-Bitboard = lambda v: _Bitboard(v) & MAX_INT
+def pretty(bb: Bitboard) -> str:
+    """Render a bitboard as an 8x8 grid."""
+    return str(_Bitboard(bb & MAX_INT))
 
 
-EMPTY = Bitboard(0)
-UNIVERSE = Bitboard(MAX_INT)
+EMPTY = 0
+UNIVERSE = MAX_INT
 DIRECTIONS = [8, 1, -8, -1, 7, 9, -7, -9]
 
 
@@ -66,7 +56,7 @@ class _BitboardMixin(int):
 
     @property
     def bitboard(self) -> Bitboard:
-        return Bitboard(1 << self._value_)
+        return 1 << self._value_
 
 
 class Square(_BitboardMixin):
@@ -76,7 +66,7 @@ class Square(_BitboardMixin):
 
     @property
     def bitboard(self) -> Bitboard:
-        return Bitboard(1 << self)
+        return 1 << self
 
 
 class AutoIncrementingEnum(IntEnum):
@@ -108,6 +98,12 @@ class PieceType(IntEnum):
     ENPASSANT = 7
 
 
+# Bitboards by color and piece type are stored flat at ``color * 8 + piece_type``, with each
+# color's occupancy in its unused ``PieceType.NULL`` slot.
+OCCUPANCY = 0
+BOARD_COUNT = 16
+
+
 class Color(IntEnum):
     WHITE = 0
     BLACK = 1
@@ -193,13 +189,13 @@ class Squares(SquareEnum):
 
     @property
     def bitboard(self) -> Bitboard:
-        return Bitboard(1 << self._value_)
+        return 1 << self._value_
 
 
 class Ranks:
     """Ranks from white perspective"""
 
-    RANK_1 = Bitboard(
+    RANK_1 = (
         Squares.A1.bitboard
         | Squares.B1.bitboard
         | Squares.C1.bitboard
@@ -209,24 +205,24 @@ class Ranks:
         | Squares.G1.bitboard
         | Squares.H1.bitboard
     )
-    RANK_2 = Bitboard(RANK_1 << 8)
-    RANK_3 = Bitboard(RANK_2 << 8)
-    RANK_4 = Bitboard(RANK_3 << 8)
-    RANK_5 = Bitboard(RANK_4 << 8)
-    RANK_6 = Bitboard(RANK_5 << 8)
-    RANK_7 = Bitboard(RANK_6 << 8)
-    RANK_8 = Bitboard(RANK_7 << 8)
+    RANK_2 = RANK_1 << 8
+    RANK_3 = RANK_2 << 8
+    RANK_4 = RANK_3 << 8
+    RANK_5 = RANK_4 << 8
+    RANK_6 = RANK_5 << 8
+    RANK_7 = RANK_6 << 8
+    RANK_8 = RANK_7 << 8
 
 
 class Files:
-    A = Bitboard(reduce(ior, (getattr(Squares, f"A{i}").bitboard for i in range(1, 9))))
-    B = Bitboard(reduce(ior, (getattr(Squares, f"B{i}").bitboard for i in range(1, 9))))
-    C = Bitboard(reduce(ior, (getattr(Squares, f"C{i}").bitboard for i in range(1, 9))))
-    D = Bitboard(reduce(ior, (getattr(Squares, f"D{i}").bitboard for i in range(1, 9))))
-    E = Bitboard(reduce(ior, (getattr(Squares, f"E{i}").bitboard for i in range(1, 9))))
-    F = Bitboard(reduce(ior, (getattr(Squares, f"F{i}").bitboard for i in range(1, 9))))
-    G = Bitboard(reduce(ior, (getattr(Squares, f"G{i}").bitboard for i in range(1, 9))))
-    H = Bitboard(reduce(ior, (getattr(Squares, f"H{i}").bitboard for i in range(1, 9))))
+    A = reduce(ior, (getattr(Squares, f"A{i}").bitboard for i in range(1, 9)))
+    B = reduce(ior, (getattr(Squares, f"B{i}").bitboard for i in range(1, 9)))
+    C = reduce(ior, (getattr(Squares, f"C{i}").bitboard for i in range(1, 9)))
+    D = reduce(ior, (getattr(Squares, f"D{i}").bitboard for i in range(1, 9)))
+    E = reduce(ior, (getattr(Squares, f"E{i}").bitboard for i in range(1, 9)))
+    F = reduce(ior, (getattr(Squares, f"F{i}").bitboard for i in range(1, 9)))
+    G = reduce(ior, (getattr(Squares, f"G{i}").bitboard for i in range(1, 9)))
+    H = reduce(ior, (getattr(Squares, f"H{i}").bitboard for i in range(1, 9)))
 
 
 SQUARES = {i: Squares[square] for i, square in enumerate(Squares.__members__)}
@@ -406,16 +402,35 @@ class CastlingRights(int):
         return self >> 2
 
 
-SubState = NamedTuple(
-    "Substate",
-    [
-        ("castling", CastlingRights),
-        ("captured", AbstractPiece),
-        ("ep", Square),
-        ("move", "Move"),
-        ("fen", str),
-    ],
-)
+class UndoRecord:
+    """What ``Position.unmake_move`` can't recompute, kept per ply by ``State``.
+
+    ``key`` and ``pawn_key`` are the keys from before the move; the other fields are the
+    state after it.
+    """
+
+    __slots__ = (
+        "castling",
+        "captured",
+        "ep",
+        "half_move_clock",
+        "move",
+        "key",
+        "pawn_key",
+        "ep_board",
+        "pins_and_checkers",
+    )
+
+    def __init__(self):
+        self.castling = None
+        self.captured = None
+        self.ep = None
+        self.half_move_clock = 0
+        self.move = None
+        self.key = 0
+        self.pawn_key = 0
+        self.ep_board = EMPTY
+        self.pins_and_checkers = None
 
 
 class State:
@@ -436,52 +451,126 @@ class State:
         )
         castling_rights = castling_rights if castling_rights != "-" else "none"
         castling_rights = CastlingRights(CastlingRightsEnum[castling_rights]._value_)
+        self.__reset(
+            Color.WHITE if turn in ("w", 0) else Color.BLACK,
+            castling_rights,
+            ep_square,
+            int(half_move_clock),
+            int(full_move_clock),
+            move,
+            fen,
+            UNDO_STACK_SIZE,
+        )
 
-        self.half_move_clock = int(half_move_clock)
-        self.full_move_clock = int(full_move_clock)
-        self.turn = Color.WHITE if turn in ("w", 0) else Color.BLACK
-        self.__stack = deque(
-            [SubState(castling=castling_rights, captured=None, ep=ep_square, move=move, fen=fen)]
+    @classmethod
+    def from_values(
+        cls,
+        turn: Color,
+        castling_rights: int,
+        ep_square: Optional[int],
+        half_move_clock: int,
+        full_move_clock: int,
+        stack_size: int = UNDO_STACK_SIZE,
+    ) -> "State":
+        """A state rooted at already parsed values, with no root FEN."""
+        state = cls.__new__(cls)
+        state.__reset(
+            turn,
+            CastlingRights(castling_rights),
+            Square(ep_square) if ep_square is not None else None,
+            half_move_clock,
+            full_move_clock,
+            None,
+            None,
+            stack_size,
         )
+        return state
+
+    def copy(self) -> "State":
+        """A state rooted at the current one, without the records of the moves before it."""
+        return self.from_values(
+            self.turn,
+            self.castling_rights,
+            self.ep_square,
+            self.half_move_clock,
+            self.full_move_clock,
+            COPY_UNDO_STACK_SIZE,
+        )
+
+    def __reset(self, turn, castling_rights, ep_square, half_move_clock, full_move_clock, move, fen, stack_size):
+        self.fen = fen  # of the root; later FENs are built on demand by ``Position.fen``
+        self.full_move_clock = full_move_clock
+        self.turn = turn
+        self.__stack = [UndoRecord() for _ in range(stack_size)]
+        self.__top = 0
+        root = self.__stack[0]
+        root.castling = castling_rights
+        root.ep = ep_square
+        root.half_move_clock = half_move_clock
+        root.move = move
 
     def __iter__(self):
-        return reversed(self.__stack)
+        """The records from the root to the current position."""
+        return islice(self.__stack, self.__top + 1)
 
     @staticmethod
     def __update_castling_rights(prev, current):
         intersect = prev & current
         return (prev ^ intersect) if intersect else prev
 
-    def push(self, captured=None, castling=None, ep_square=None, move=None, fen=None):
+    def push(
+        self,
+        captured=None,
+        castling=None,
+        ep_square=None,
+        move=None,
+        half_move_clock=0,
+        key=0,
+        pawn_key=0,
+        ep_board=EMPTY,
+        pins_and_checkers=None,
+    ):
         self.full_move_clock += 1
         self.turn = ~self.turn
-        cur = self.__stack[0]
-        _s = SubState(
-            castling=self.__update_castling_rights(cur.castling, castling),
-            captured=captured,
-            ep=ep_square,
-            move=move,
-            fen=fen
-        )
-        self.__stack.appendleft(_s)
-
-    def pop(self):
+        stack = self.__stack
+        cur = stack[self.__top]
+        self.__top += 1
+        if self.__top == len(stack):
+            stack.extend(UndoRecord() for _ in range(len(stack)))
+        record = stack[self.__top]
+        record.castling = self.__update_castling_rights(cur.castling, castling)
+        record.captured = captured
+        record.ep = ep_square
+        record.half_move_clock = half_move_clock
+        record.move = move
+        record.key = key
+        record.pawn_key = pawn_key
+        record.ep_board = ep_board
+        record.pins_and_checkers = pins_and_checkers
+
+    def pop(self) -> UndoRecord:
+        """Returns the record of the last move; it is reused by the next ``push``."""
+        assert self.__top, "no move to take back"
         self.full_move_clock -= 1
         self.turn = ~self.turn
-        if self.__stack:
-            return self.__stack.popleft()
-        return (CastlingRights(15), None, None)
+        record = self.__stack[self.__top]
+        self.__top -= 1
+        return record
 
-    def top(self):
-        return self.__stack[0]
+    def top(self) -> UndoRecord:
+        return self.__stack[self.__top]
 
     @property
     def castling_rights(self):
-        return self.__stack[0].castling
+        return self.__stack[self.__top].castling
 
     @property
     def ep_square(self):
-        return self.__stack[0].ep
+        return self.__stack[self.__top].ep
+
+    @property
+    def half_move_clock(self) -> int:
+        return self.__stack[self.__top].half_move_clock
 
     @property
     def ply(self):
@@ -503,6 +592,23 @@ class State:
 
 PieceAndSquare = NamedTuple("PieceAndSquare", [("piece", AbstractPiece), ("square", Square)])
 
+
+class PositionSnapshot(NamedTuple):
+    """An immutable copy of a position, without its move history.
+
+    ``boards`` is ``StackedBitboard.boards``: every bitboard at ``color * 8 + piece_type``.
+    """
+
+    boards: Tuple[int, ...]
+    turn: Color
+    castling_rights: int
+    ep_square: Optional[int]
+    half_move_clock: int
+    full_move_clock: int
+    key: int
+    pawn_key: int
+
+
 class NodeType(IntEnum):
     EXACT = 0
     ALPHA = 1
@@ -510,8 +616,8 @@ class NodeType(IntEnum):
 
 @dataclass
 class SearchResult:
-    ply: int
-    score: float
+    ply: int = 0
+    score: float = 0
     move: "Move" = None
     alpha: float = -INFINITY
     beta: float = INFINITY
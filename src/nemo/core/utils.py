@@ -1,6 +1,6 @@
 from cProfile import Profile
 from itertools import chain, zip_longest
-from typing import Iterable
+from typing import Iterable, List, Sequence
 
 from .constants import MAX_INT
 from .ext.build import build_library
@@ -141,26 +141,23 @@ BIT_TABLE = [
 
 
 
-EXT_EXISTS, lib = build_library()
-if EXT_EXISTS and hasattr(lib, "bb"):
-    _bb = lib.bb
-else:
-    _bb = lambda v: v & MAX_INT
+EXT_EXISTS, ffi, lib = build_library()
+BACKEND = "cffi" if EXT_EXISTS else "python"  # reported by perft
+# Scalar helpers stay in Python even when the extension is built: a cffi
+# call costs more than ``v & -v`` or ``bin(v).count``, so only the batch
+# entry points below (one call per board, not per bit) go through C.
+_bb = lambda v: v & MAX_INT
 
 DEBRUIJN_CONST = _bb(0x03F79D71B4CB0A89)
 
-if EXT_EXISTS and hasattr(lib, "lsb"):
-    lsb = lib.lsb
-else:
-    def lsb(v: int) -> int:
-        """Returns the least significant bit of the input."""
-        return v & -v
-if EXT_EXISTS and hasattr(lib, "popcnt"):
-    popcnt = lib.popcnt
-else:
-    def popcnt(v: int) -> int:
-        """Returns the number of ones in a binary representation of the input."""
-        return bin(v).count("1")
+def lsb(v: int) -> int:
+    """Returns the least significant bit of the input."""
+    return v & -v
+
+
+def popcnt(v: int) -> int:
+    """Returns the number of ones in a binary representation of the input."""
+    return bin(v).count("1")
 
 
 def iter_lsb(bb: int) -> "Generator[int, None, None]":
@@ -170,17 +167,40 @@ def iter_lsb(bb: int) -> "Generator[int, None, None]":
         yield _lsb
         bb ^= _lsb
 
-if EXT_EXISTS and hasattr(lib, "bitScanForward"):
-    bitscan_forward = lib.bitScanForward
+def bitscan_forward(bb: int):
+    return BITSCAN_INDEX[_bb(lsb(bb) * DEBRUIJN_CONST) >> 58]
+
+
+if EXT_EXISTS and hasattr(lib, "bitscan_all"):
+    def bitscan_all(bb: int) -> Sequence[int]:
+        """The squares of every set bit, lowest first, scanned in one call into C."""
+        squares = ffi.new("unsigned char[64]")
+        return ffi.buffer(squares, lib.bitscan_all(bb, squares))[:]
 else:
-    def bitscan_forward(bb: int):
-        return BITSCAN_INDEX[_bb(lsb(bb) * DEBRUIJN_CONST) >> 58]
+    def bitscan_all(bb: int) -> Sequence[int]:
+        """The squares of every set bit, lowest first."""
+        return [bitscan_forward(isolated_lsb) for isolated_lsb in iter_lsb(bb)]
+
 
+if EXT_EXISTS and hasattr(lib, "popcnt_many"):
+    def popcnt_many(boards: Sequence[int]) -> Sequence[int]:
+        """The popcount of each of ``boards``, counted in one call into C."""
+        counts = ffi.new("unsigned char[]", len(boards))
+        lib.popcnt_many(boards, len(boards), counts)
+        return ffi.buffer(counts)[:]
+else:
+    def popcnt_many(boards: Sequence[int]) -> Sequence[int]:
+        """The popcount of each of ``boards``."""
+        return [popcnt(bb) for bb in boards]
 
-def iter_bitscan_forward(bb: int) -> "Generator[int, None, None]":
-    if bb:
-        for isolated_lsb in iter_lsb(bb):
-            yield bitscan_forward(isolated_lsb)
+
+if EXT_EXISTS and hasattr(lib, "bitscan_all"):
+    iter_bitscan_forward = bitscan_all
+else:
+    def iter_bitscan_forward(bb: int) -> "Generator[int, None, None]":
+        if bb:
+            for isolated_lsb in iter_lsb(bb):
+                yield bitscan_forward(isolated_lsb)
 
 
 def rank_mask(s: int) -> int:
@@ -196,7 +216,7 @@ def diag_mask(s: int) -> int:
     d = ((s & 7) << 3) - (s & 56)
     n = -d & (d >> 31)
     s = d & (-d >> 31)
-    return (md >> s) << n
+    return (md >> s) << n & MAX_INT
 
 
 def antidiag_mask(s: int) -> int:
@@ -204,7 +224,7 @@ def antidiag_mask(s: int) -> int:
     d = 56 - ((s & 7) << 3) - (s & 56)
     n = -d & (d >> 31)
     s = d & (-d >> 31)
-    return (md >> s) << n
+    return (md >> s) << n & MAX_INT
 
 
 class SectionProfiler:
@@ -1,18 +1,36 @@
 from sys import argv
-from time import time
 
-from nemo.core.constants import STARTING_FEN
-from nemo.core.perft import perft
+from nemo.core.constants import PERFT_HASH_SIZE_MB, STARTING_FEN
+from nemo.core.perft import divide, perft
 from nemo.core.utils import SectionProfiler
 
+
+def option(name: str, default: int) -> int:
+    return int(argv[argv.index(name) + 1]) if name in argv else default
+
+
 if __name__ == "__main__":
+    workers = option("--workers", 1)
     while True:
         # depth = input("Depth: ")
         fen = input("FEN:") or STARTING_FEN
+        if "--divide" in argv:
+            counts = divide(option("--divide", 1), fen=fen, workers=workers)
+            for move, count in counts.items():
+                print(f"{move}: {count}")
+            print(f"total: {sum(counts.values())}\n")
+            continue
         # with SectionProfiler():
         for depth in range(1, 7):
-            start = time()
-            n = perft(int(depth), fen=fen)
+            n = perft(
+                int(depth),
+                fen=fen,
+                verify="--verify" in argv,
+                copy_make="--copy-make" in argv,
+                stats="--stats" in argv,
+                hash_mb=PERFT_HASH_SIZE_MB if "--hash" in argv else 0,
+                workers=workers,
+            )
             print(f"depth={depth} fen={fen}:\n{n}")
-            print(f"{(n.nodes / 1000) / (time() - start) } kN/sec")
+            print(f"{n.knps} kN/sec ({n.backend})")
         print("\n")
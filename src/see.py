@@ -1,5 +1,6 @@
 from nemo.core.constants import STARTING_FEN
 from nemo.core.evaluation import see
+from nemo.core.move import MOVES
 from nemo.core.position import Position
 from nemo.core.search import get_ordered_moves
 
@@ -8,9 +9,9 @@ def run():
     p = Position(fen=input("FEN: ") or STARTING_FEN)
     print(p)
     for move in p.legal_moves:
-        print(move, see(p, move))
+        print(MOVES[move], see(p, move))
 
-    print(get_ordered_moves(p, 0))
+    print([MOVES[move] for move in get_ordered_moves(p, 0)])
 
 
 
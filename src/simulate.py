@@ -1,15 +1,44 @@
-from nemo.core.search import Searcher
+from itertools import product
+from sys import argv
+from time import time
+
+from nemo.core.search import Searcher, SearchOptions
 from nemo.core.position import Position
 from nemo.core.game import Game
-from nemo.core.transposition import TTable, Killers
+from nemo.core.transposition import TTable, Killers, clear_tables
+
+FEN = "r2r3k/ppp3pp/8/b5N1/2Q5/8/5PP1/6K1 w - - 0 1"
 
 
 def run(n=80):
-    p = Position(fen="r2r3k/ppp3pp/8/b5N1/2Q5/8/5PP1/6K1 w - - 0 1")
+    p = Position(fen=FEN)
     print(p)
     searcher = Searcher()
     searcher.search(p, depth=8)
 
 
+def compare(depth=5, fen=FEN, toggles=("null_move", "lmr", "futility")):
+    """Searches ``fen`` with every combination of the boolean search options in ``toggles``,
+    reporting node counts and time."""
+    for values in product((False, True), repeat=len(toggles)):
+        clear_tables()
+        options = dict(zip(toggles, values))
+        searcher = Searcher(options=SearchOptions(**options))
+        start = time()
+        result = searcher.search(Position(fen=fen), depth=depth)
+        print(
+            " ".join(f"{k}={v}" for k, v in options.items()),
+            f"move={result.move} score={result.score} "
+            f"nodes={searcher.stats['nodes']} time={time() - start:.2f}s",
+        )
+
+
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    if "--compare" in argv:
+        toggles = argv[argv.index("--compare") + 1:]
+        if toggles:
+            compare(toggles=toggles)
+        else:
+            compare()
+    else:
+        run()